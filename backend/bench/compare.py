@@ -0,0 +1,50 @@
+"""두 벤치마크 결과(JSON)를 동시성 단계별로 비교합니다.
+
+    python bench/compare.py bench/results/<기준>.json bench/results/<새 결과>.json
+"""
+import json
+import sys
+
+METRICS = [
+    ("req/s", lambda level: level["requests_per_s"], True),
+    ("p50 ms", lambda level: level["latency"]["p50_ms"], False),
+    ("p95 ms", lambda level: level["latency"]["p95_ms"], False),
+    ("p99 ms", lambda level: level["latency"]["p99_ms"], False),
+    ("errors", lambda level: level["errors"], False),
+    ("spoon/req", lambda level: level["upstream_calls_per_request"]["spoonacular"], False),
+    ("deepl/req", lambda level: level["upstream_calls_per_request"]["deepl"], False),
+    ("supabase/req", lambda level: level["upstream_calls_per_request"]["supabase"], False),
+]
+
+
+def change(old, new, higher_is_better):
+    if old is None or new is None:
+        return ""
+    if old == 0:
+        return "" if new == 0 else "new"
+    pct = (new - old) / old * 100
+    better = pct > 0 if higher_is_better else pct < 0
+    mark = "✅" if better and abs(pct) >= 5 else "❌" if not better and abs(pct) >= 5 else ""
+    return f"{pct:+.1f}% {mark}".rstrip()
+
+
+def compare(base, new):
+    print(f"기준: {base['commit']} ({base['timestamp']})  →  비교: {new['commit']} ({new['timestamp']})")
+    if base["config"] != new["config"]:
+        print("⚠️ 두 결과의 벤치마크 설정이 다릅니다.")
+    base_levels = {level["concurrency"]: level for level in base["levels"]}
+    for level in new["levels"]:
+        old = base_levels.get(level["concurrency"])
+        if old is None:
+            continue
+        print(f"\nconcurrency={level['concurrency']}")
+        for name, get, higher_is_better in METRICS:
+            before, after = get(old), get(level)
+            print(f"  {name:<13} {before!s:>10} → {after!s:>10}  {change(before, after, higher_is_better)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    with open(sys.argv[1]) as f1, open(sys.argv[2]) as f2:
+        compare(json.load(f1), json.load(f2))
@@ -0,0 +1,209 @@
+"""Spoonacular / DeepL / Supabase를 흉내 내는 로컬 가짜 서버.
+
+실제 API 쿼터를 쓰지 않고 백엔드 처리량을 측정하기 위해 사용합니다.
+각 업스트림은 별도 포트에서 뜨고, 응답마다 `latency ± jitter` 만큼 지연됩니다.
+
+    python bench/fake_upstreams.py --spoonacular-port 9101 --deepl-port 9102 --supabase-port 9103 \
+        --latency-ms 120 --jitter-ms 40
+
+호출 수는 각 서버의 `GET /__stats`로 확인하고 `POST /__reset`으로 초기화합니다.
+"""
+import argparse
+import asyncio
+import random
+from urllib.parse import parse_qs
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+INGREDIENTS = [
+    "egg", "onion", "garlic", "milk", "butter", "flour", "sugar", "salt", "pepper", "rice",
+    "chicken", "beef", "pork", "tofu", "kimchi", "potato", "carrot", "cabbage", "mushroom", "tomato",
+    "cheese", "soy sauce", "sesame oil", "green onion", "chili", "spinach", "zucchini", "shrimp", "noodle", "apple",
+]
+# 벤치마크 워크로드에서 쓰는 한국어 재료명 → 영어 (나머지는 "[EN]..." 형태로 번역)
+KO_EN = {
+    "계란": "egg", "양파": "onion", "마늘": "garlic", "우유": "milk", "버터": "butter", "밀가루": "flour",
+    "설탕": "sugar", "소금": "salt", "후추": "pepper", "쌀": "rice", "닭고기": "chicken", "소고기": "beef",
+    "돼지고기": "pork", "두부": "tofu", "김치": "kimchi", "감자": "potato", "당근": "carrot", "양배추": "cabbage",
+    "버섯": "mushroom", "토마토": "tomato", "치즈": "cheese", "간장": "soy sauce", "참기름": "sesame oil",
+    "대파": "green onion", "고추": "chili", "시금치": "spinach", "애호박": "zucchini", "새우": "shrimp",
+    "국수": "noodle", "사과": "apple", "땅콩": "peanut", "갑각류": "shellfish",
+}
+TOTAL_RECIPES = 500
+
+
+class UpstreamState:
+    def __init__(self, name, latency_ms, jitter_ms, error_rate, seed):
+        self.name = name
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.characters = 0
+
+    async def delay(self):
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+        return self.random.random() < self.error_rate
+
+    def stats_routes(self):
+        async def stats(request):
+            return JSONResponse({"upstream": self.name, "calls": self.calls, "characters": self.characters})
+
+        async def reset(request):
+            self.calls = 0
+            self.characters = 0
+            return JSONResponse({"ok": True})
+
+        return [Route("/__stats", stats), Route("/__reset", reset, methods=["POST"])]
+
+
+def recipe_ingredients(recipe_id):
+    rng = random.Random(recipe_id)
+    return rng.sample(INGREDIENTS, rng.randint(4, 9))
+
+
+def recipe_summary(recipe_id):
+    names = recipe_ingredients(recipe_id)
+    return {
+        "id": recipe_id,
+        "title": f"Test Recipe {recipe_id}",
+        "image": f"https://img.example.com/{recipe_id}.jpg",
+        "readyInMinutes": 10 + recipe_id % 50,
+        "servings": 1 + recipe_id % 4,
+        "extendedIngredients": [
+            {"name": name, "original": f"{1 + i} cup {name}"} for i, name in enumerate(names)
+        ],
+    }
+
+
+def spoonacular_app(state):
+    async def complex_search(request):
+        if await state.delay():
+            return JSONResponse({"message": "fake upstream error"}, status_code=500)
+        params = request.query_params
+        offset = int(params.get("offset", 0))
+        number = int(params.get("number", 10))
+        wanted = [w.strip() for w in params.get("includeIngredients", "").split(",") if w.strip()]
+        # 요청 재료에 따라 결정적으로 레시피 id 순서를 정함 → 같은 요청은 같은 결과
+        rng = random.Random(",".join(sorted(wanted)))
+        ids = rng.sample(range(1, TOTAL_RECIPES + 1), 120)
+        page = ids[offset:offset + number]
+        return JSONResponse({
+            "offset": offset, "number": number, "totalResults": len(ids),
+            "results": [recipe_summary(rid) for rid in page],
+        })
+
+    async def information(request):
+        if await state.delay():
+            return JSONResponse({"message": "fake upstream error"}, status_code=500)
+        recipe_id = int(request.path_params["id"])
+        data = recipe_summary(recipe_id)
+        names = recipe_ingredients(recipe_id)
+        data["summary"] = (
+            f"<b>Test Recipe {recipe_id}</b> is a <a href=\"#\">tasty</a> dish. "
+            f"It uses {', '.join(names)}. It serves {data['servings']}."
+        )
+        data["instructions"] = "<ol>" + "".join(
+            f"<li>Prepare the {name}. Mix well.</li>" for name in names
+        ) + "</ol>"
+        return JSONResponse(data)
+
+    async def substitutes(request):
+        if await state.delay():
+            return JSONResponse({"message": "fake upstream error"}, status_code=500)
+        name = request.query_params.get("ingredientName", "")
+        return JSONResponse({
+            "status": "success", "ingredient": name,
+            "substitutes": [f"1 cup {name} substitute A", f"1 cup {name} substitute B"],
+        })
+
+    return Starlette(routes=state.stats_routes() + [
+        Route("/recipes/complexSearch", complex_search),
+        Route("/recipes/{id:int}/information", information),
+        Route("/food/ingredients/substitutes", substitutes),
+    ])
+
+
+def deepl_app(state):
+    async def translate(request):
+        body = parse_qs((await request.body()).decode())
+        texts = body.get("text", [])
+        target_lang = body.get("target_lang", ["KO"])[0].upper()
+        state.characters += sum(len(t) for t in texts)
+        if await state.delay():
+            return JSONResponse({"message": "fake upstream error"}, status_code=503)
+        translations = []
+        for text in texts:
+            if target_lang == "EN" and text in KO_EN:
+                translations.append({"text": KO_EN[text]})
+            else:
+                translations.append({"text": f"[{target_lang}]{text}"})
+        return JSONResponse({"translations": translations})
+
+    return Starlette(routes=state.stats_routes() + [Route("/v2/translate", translate, methods=["POST"])])
+
+
+def supabase_app(state):
+    # PostgREST 흉내: /rest/v1/{table} 에 대한 select/insert/upsert만 지원
+    tables = {}
+
+    async def table(request: Request):
+        if await state.delay():
+            return JSONResponse({"message": "fake upstream error"}, status_code=500)
+        rows = tables.setdefault(request.path_params["table"], [])
+        if request.method == "GET":
+            filters = {
+                key: value.split(".", 1)[1]
+                for key, value in request.query_params.items()
+                if key != "select" and value.startswith("eq.")
+            }
+            return JSONResponse([r for r in rows if all(str(r.get(k)) == v for k, v in filters.items())])
+        payload = await request.json()
+        payload = payload if isinstance(payload, list) else [payload]
+        rows.extend(payload)
+        return JSONResponse(payload, status_code=201)
+
+    return Starlette(routes=state.stats_routes() + [
+        Route("/rest/v1/{table}", table, methods=["GET", "POST", "PATCH"]),
+    ])
+
+
+def build_servers(args):
+    specs = [
+        ("spoonacular", spoonacular_app, args.spoonacular_port),
+        ("deepl", deepl_app, args.deepl_port),
+        ("supabase", supabase_app, args.supabase_port),
+    ]
+    servers = []
+    for offset, (name, factory, port) in enumerate(specs):
+        state = UpstreamState(name, args.latency_ms, args.jitter_ms, args.error_rate, args.seed + offset)
+        config = uvicorn.Config(factory(state), host=args.host, port=port, log_level="warning", access_log=False)
+        servers.append(uvicorn.Server(config))
+    return servers
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="로컬 가짜 업스트림 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--spoonacular-port", type=int, default=9101)
+    parser.add_argument("--deepl-port", type=int, default=9102)
+    parser.add_argument("--supabase-port", type=int, default=9103)
+    parser.add_argument("--latency-ms", type=float, default=120.0, help="업스트림 응답 지연 평균 (ms)")
+    parser.add_argument("--jitter-ms", type=float, default=40.0, help="지연에 더해지는 ±jitter (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="오류 응답 비율 (0~1)")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    await asyncio.gather(*(server.serve() for server in build_servers(args)))
+
+
+if __name__ == "__main__":
+    asyncio.run(serve(parse_args()))
@@ -0,0 +1,327 @@
+"""오프라인 벤치마크: 가짜 업스트림에 연결된 main.app에 워크로드를 재생합니다.
+
+    cd backend
+    python bench/run_bench.py --concurrency 1,8,32 --requests 200 --latency-ms 120 --jitter-ms 40
+
+동시성 단계마다 앱을 새로 띄우고(빈 캐시, 새 SQLite 파일) 다음을 측정합니다.
+  - 엔드포인트별/전체 p50·p95·p99 지연시간, 초당 요청 수, 오류 수
+  - 요청당 업스트림(Spoonacular/DeepL/Supabase) 호출 수, DeepL로 보낸 글자 수
+결과는 bench/results/<커밋>-<시각>.json 으로 저장되며 bench/compare.py로 비교할 수 있습니다.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+UPSTREAMS = ("spoonacular", "deepl", "supabase")
+ENDPOINTS = ("get_recipes", "get_recipes_by_percent", "get_recipe_detail", "get_multiple_recipe_details")
+
+KO_INGREDIENTS = [
+    "계란", "양파", "마늘", "우유", "버터", "밀가루", "설탕", "소금", "후추", "쌀",
+    "닭고기", "소고기", "돼지고기", "두부", "김치", "감자", "당근", "양배추", "버섯", "토마토",
+    "치즈", "간장", "참기름", "대파", "고추", "시금치", "애호박", "새우", "국수", "사과",
+]
+ALLERGIES = ["", "", "", "땅콩", "우유", "갑각류"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2) if values else None,
+        "p95_ms": round(percentile(values, 95) * 1000, 2) if values else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 2) if values else None,
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else None,
+    }
+
+
+# ✅ 워크로드: 실제 사용 패턴처럼 인기 재료/레시피가 반복되도록 편향된 분포 사용
+class Workload:
+    def __init__(self, seed, mix, hot_recipes=60, total_recipes=500):
+        self.random = random.Random(seed)
+        self.mix = mix
+        self.hot_recipes = hot_recipes
+        self.total_recipes = total_recipes
+
+    def recipe_id(self):
+        # 80%는 인기 레시피, 20%는 롱테일
+        if self.random.random() < 0.8:
+            return self.random.randint(1, self.hot_recipes)
+        return self.random.randint(1, self.total_recipes)
+
+    def ingredients_body(self):
+        popular = KO_INGREDIENTS[:10]
+        pool = popular if self.random.random() < 0.7 else KO_INGREDIENTS
+        return {
+            "ingredients": self.random.sample(pool, self.random.randint(1, 3)),
+            "allergies": self.random.choice(ALLERGIES),
+        }
+
+    def next_request(self):
+        endpoint = self.random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if endpoint == "get_recipes":
+            return endpoint, "POST", "/get_recipes/", {}, self.ingredients_body()
+        if endpoint == "get_recipes_by_percent":
+            return endpoint, "POST", "/get_recipes_by_percent/", {}, self.ingredients_body()
+        if endpoint == "get_recipe_detail":
+            return endpoint, "GET", "/get_recipe_detail/", {"id": self.recipe_id()}, None
+        ids = sorted({self.recipe_id() for _ in range(self.random.randint(2, 8))})
+        return endpoint, "POST", "/get_multiple_recipe_details/", {}, ids
+
+
+# ✅ 프로세스 관리
+def start_process(args, env=None):
+    # 로그(stderr)는 그대로 보여주고 stdout은 버림
+    return subprocess.Popen(args, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+
+
+async def wait_until_up(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url, timeout=1.0)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"서버가 시작되지 않았습니다: {url}")
+
+
+def stop_process(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def app_env(ports, db_path, log_level):
+    env = dict(os.environ)
+    env.update({
+        "SPOONACULAR_BASE_URL": f"http://127.0.0.1:{ports['spoonacular']}",
+        "DEEPL_URL": f"http://127.0.0.1:{ports['deepl']}/v2/translate",
+        "SUPABASE_URL": f"http://127.0.0.1:{ports['supabase']}",
+        # supabase-py가 JWT 형식의 키를 요구하므로 더미 anon 키 사용
+        "SUPABASE_KEY": env.get("BENCH_SUPABASE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.bench"),
+        "SPOONACULAR_API_KEY": "bench",
+        "DEEPL_API_KEY": "bench",
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "LOG_LEVEL": log_level,
+        # 모든 워커가 127.0.0.1에서 요청하므로 IP당 제한은 사실상 끔 (사용자당 제한만 측정)
+        "ADMISSION_MAX_PER_IP": env.get("ADMISSION_MAX_PER_IP", "100000"),
+    })
+    return env
+
+
+async def upstream_stats(client, ports):
+    stats = {}
+    for name in UPSTREAMS:
+        response = await client.get(f"http://127.0.0.1:{ports[name]}/__stats")
+        stats[name] = response.json()
+    return stats
+
+
+async def reset_upstreams(client, ports):
+    for name in UPSTREAMS:
+        await client.post(f"http://127.0.0.1:{ports[name]}/__reset")
+
+
+# ✅ 부하 생성
+async def run_level(base_url, workload, concurrency, total_requests, timeout):
+    latencies = {name: [] for name in ENDPOINTS}
+    errors = {name: 0 for name in ENDPOINTS}
+    requests_iter = iter([workload.next_request() for _ in range(total_requests)])
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def worker(index):
+            headers = {"X-User-Id": f"bench-{index}"}  # 워커마다 다른 사용자 (앱의 사용자당 동시 요청 제한)
+            for endpoint, method, path, params, body in requests_iter:
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, params=params, json=body, headers=headers)
+                    await response.aread()
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                if ok:
+                    latencies[endpoint].append(elapsed)
+                else:
+                    errors[endpoint] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(index) for index in range(concurrency)))
+        duration = time.perf_counter() - start
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    return {
+        "duration_s": round(duration, 3),
+        "requests": total_requests,
+        "errors": sum(errors.values()),
+        "requests_per_s": round(total_requests / duration, 2) if duration else None,
+        "latency": summarize(all_latencies),
+        "endpoints": {
+            name: dict(summarize(latencies[name]), errors=errors[name])
+            for name in ENDPOINTS
+            if latencies[name] or errors[name]
+        },
+    }
+
+
+async def bench(args):
+    ports = {name: free_port() for name in UPSTREAMS}
+    fake = start_process([
+        sys.executable, str(BENCH_DIR / "fake_upstreams.py"),
+        "--spoonacular-port", str(ports["spoonacular"]),
+        "--deepl-port", str(ports["deepl"]),
+        "--supabase-port", str(ports["supabase"]),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate),
+        "--seed", str(args.seed),
+    ])
+    levels = []
+    try:
+        for name in UPSTREAMS:
+            await wait_until_up(f"http://127.0.0.1:{ports[name]}/__stats")
+
+        async with httpx.AsyncClient() as control:
+            for concurrency in args.concurrency:
+                app_port = free_port()
+                with tempfile.TemporaryDirectory() as tmp:
+                    app = start_process(
+                        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                         "--port", str(app_port), "--log-level", "warning", "--no-access-log"],
+                        env=app_env(ports, os.path.join(tmp, "bench.db"), args.app_log_level),
+                    )
+                    try:
+                        base_url = f"http://127.0.0.1:{app_port}"
+                        await wait_until_up(f"{base_url}/ready")
+                        await reset_upstreams(control, ports)
+
+                        workload = Workload(args.seed, args.mix)
+                        result = await run_level(base_url, workload, concurrency, args.requests, args.timeout)
+
+                        stats = await upstream_stats(control, ports)
+                        result["concurrency"] = concurrency
+                        result["upstream_calls"] = {name: stats[name]["calls"] for name in UPSTREAMS}
+                        result["upstream_calls_per_request"] = {
+                            name: round(stats[name]["calls"] / args.requests, 3) for name in UPSTREAMS
+                        }
+                        result["deepl_characters"] = stats["deepl"]["characters"]
+                        levels.append(result)
+                        print_level(result)
+                    finally:
+                        stop_process(app)
+    finally:
+        stop_process(fake)
+    return levels
+
+
+def print_level(result):
+    lat = result["latency"]
+    calls = result["upstream_calls_per_request"]
+    print(
+        f"c={result['concurrency']:>3}  {result['requests_per_s']:>8} req/s  "
+        f"p50={lat['p50_ms']}ms p95={lat['p95_ms']}ms p99={lat['p99_ms']}ms  "
+        f"errors={result['errors']}  "
+        f"calls/req spoon={calls['spoonacular']} deepl={calls['deepl']} supabase={calls['supabase']}"
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_mix(value):
+    # "get_recipes=4,get_recipe_detail=3,..." → {"get_recipes": 4.0, ...}
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"알 수 없는 엔드포인트: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="가짜 업스트림을 사용한 오프라인 벤치마크")
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="동시성 단계별 요청 수")
+    parser.add_argument("--latency-ms", type=float, default=120.0)
+    parser.add_argument("--jitter-ms", type=float, default=40.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--mix", type=parse_mix,
+        default=parse_mix("get_recipes=4,get_recipes_by_percent=2,get_recipe_detail=3,get_multiple_recipe_details=1"),
+        help="엔드포인트별 가중치",
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=60.0, help="요청별 클라이언트 타임아웃 (초)")
+    parser.add_argument("--app-log-level", default="WARNING")
+    parser.add_argument("--output", help="결과 JSON 경로 (기본값: bench/results/<커밋>-<시각>.json)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    levels = asyncio.run(bench(args))
+
+    commit = git_commit()
+    now = datetime.now(timezone.utc)
+    report = {
+        "commit": commit,
+        "timestamp": now.isoformat(timespec="seconds"),
+        "config": {
+            "requests": args.requests,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "levels": levels,
+    }
+    output = Path(args.output) if args.output else BENCH_DIR / "results" / f"{commit}-{now:%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"📄 결과 저장: {output}")
+
+
+if __name__ == "__main__":
+    main()
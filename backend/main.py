@@ -1,24 +1,548 @@
 from fastapi import FastAPI, HTTPException,Depends
 from pydantic import BaseModel, field_validator
-import requests
 from dotenv import load_dotenv
 import os
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+import json
 from typing import List, Optional
-from fastapi import Query
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
-from sqlalchemy import create_engine, Column, String, Integer, ForeignKey
+from fastapi import Query, Header
+from google.auth import jwt as google_jwt
+from google.auth import exceptions as google_exceptions
+from sqlalchemy import Column, String, Integer, ForeignKey, Text, Float, select, update, delete, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import relationship
 
-from fastapi import WebSocket, WebSocketDisconnect
+from fastapi import WebSocket
 import asyncio
 import httpx
+from contextlib import asynccontextmanager, contextmanager
+import contextvars
+from collections import OrderedDict, deque
+import heapq
+import itertools
+import hashlib
+import weakref
+import base64
+import time
+import unicodedata
+import re
+from functools import lru_cache
+import logging
+import gzip
+from starlette.datastructures import Headers, MutableHeaders
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# 환경변수 불러오기
+load_dotenv()
+
+# ✅ 구조화 로깅 (JSON 한 줄)
+# 핫패스의 debug 로그는 logger.isEnabledFor로 감싸서 비활성화 시 비용이 들지 않게 합니다.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))  # logger.info(..., extra={"fields": {...}})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+logger = logging.getLogger("taste_trip")
+logger.setLevel(LOG_LEVEL)
+if not logger.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(JsonLogFormatter())
+    logger.addHandler(_log_handler)
+    logger.propagate = False
+
+# ✅ Prometheus 메트릭 (/metrics)
+HTTP_REQUEST_LATENCY = Histogram(
+    "taste_trip_http_request_duration_seconds", "엔드포인트별 응답 시간",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("taste_trip_http_requests_in_flight", "처리 중인 요청 수", ["method"])
+UPSTREAM_REQUESTS = Counter("taste_trip_upstream_requests_total", "업스트림 호출 수", ["upstream", "status"])
+UPSTREAM_LATENCY = Histogram(
+    "taste_trip_upstream_request_duration_seconds", "업스트림 호출 시간", ["upstream"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+UPSTREAM_HEDGED_REQUESTS = Counter("taste_trip_upstream_hedged_requests_total", "헤지 요청 수", ["upstream"])
+UPSTREAM_IN_FLIGHT = Gauge("taste_trip_upstream_requests_in_flight", "진행 중인 업스트림 호출 수", ["upstream"])
+TRANSLATION_CACHE_LOOKUPS = Counter(
+    "taste_trip_translation_cache_lookups_total", "번역 캐시 조회 결과", ["result"]  # glossary_hit | memory_hit | db_hit | miss
+)
+TRANSLATION_CACHE_HIT_RATIO = Gauge("taste_trip_translation_cache_hit_ratio", "번역 캐시 적중률 (프로세스 시작 이후)")
+DEEPL_CHARACTERS = Counter("taste_trip_deepl_characters_total", "DeepL로 보낸 글자 수", ["target_lang"])
+ADMISSION_REJECTED = Counter("taste_trip_admission_rejected_total", "과부하로 거절한 요청 수", ["route", "reason"])  # user_limit | queue_full | queue_timeout
+ADMISSION_QUEUED = Gauge("taste_trip_admission_queued", "처리 슬롯을 기다리는 요청 수", ["route"])
+UPSTREAM_CIRCUIT_OPEN = Gauge("taste_trip_upstream_circuit_open", "서킷 브레이커 상태 (0: closed, 1: open, 0.5: half-open)", ["upstream"])
+UPSTREAM_REJECTED = Counter("taste_trip_upstream_rejected_total", "스케줄러가 보내지 않고 거절한 호출 수", ["upstream", "reason"])  # circuit_open | quota_reserve
+UPSTREAM_QUOTA = Gauge("taste_trip_upstream_quota", "업스트림이 알려준 쿼터", ["upstream", "kind"])  # used | left
+UPSTREAM_QUEUE_WAIT = Histogram(
+    "taste_trip_upstream_queue_wait_seconds", "토큰을 기다린 시간", ["upstream", "priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+@asynccontextmanager
+async def track_upstream(upstream):
+    # async with track_upstream("deepl") as call: ... call["status"] = response.status_code
+    call = {"status": "error"}
+    UPSTREAM_IN_FLIGHT.labels(upstream).inc()
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        UPSTREAM_IN_FLIGHT.labels(upstream).dec()
+        UPSTREAM_LATENCY.labels(upstream).observe(time.perf_counter() - start)
+        UPSTREAM_REQUESTS.labels(upstream, str(call["status"])).inc()
+
+class MetricsMiddleware:
+    # 스트리밍 응답까지 끝날 때의 시간을 재기 위해 순수 ASGI 미들웨어로 구현
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.labels(method).inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.labels(method).dec()
+            route = scope.get("route")
+            # 라우트 템플릿(/api/user/{user_id})을 라벨로 사용해 카디널리티 제한
+            route_path = getattr(route, "path", None)
+            if route_path is None:
+                # 입장 제어에서 거절된 요청은 라우팅 전에 응답하므로, 입장 제어 대상 경로(고정 경로)는 그대로 라벨로 사용
+                route_path = scope["path"] if scope["path"] in ADMISSION_ENDPOINTS else "unmatched"
+            HTTP_REQUEST_LATENCY.labels(method, route_path, str(status["code"])).observe(time.perf_counter() - start)
+
+# ✅ 업스트림(Spoonacular / DeepL) 공용 HTTP 클라이언트
+# 요청마다 AsyncClient를 새로 만들면 매번 TCP+TLS 핸드셰이크 비용이 발생하므로
+# 업스트림별로 keep-alive 커넥션 풀을 가진 클라이언트를 하나씩 두고 재사용합니다.
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() == "true"
+# 업스트림 호출 타임아웃 (초). 여러 요청이 공유하는 호출도 있으므로 요청 예산과 별개로 항상 적용
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "10"))
+UPSTREAM_WRITE_TIMEOUT = float(os.getenv("UPSTREAM_WRITE_TIMEOUT", "10"))
+UPSTREAM_POOL_TIMEOUT = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "5"))
+
+try:
+    import h2  # noqa: F401  (httpx[http2] 설치 시에만 HTTP/2 사용)
+except ImportError:
+    UPSTREAM_HTTP2 = False
+
+# ✅ 외부 리소스 컨테이너
+# DB 엔진, Supabase 클라이언트, 업스트림 HTTP 클라이언트를 처음 사용할 때 생성하고 종료 시 한 번에 정리합니다.
+# import 시점에는 아무 연결도 만들지 않으므로 자격 증명 없이도 모듈을 불러올 수 있습니다.
+class Resources:
+    def __init__(self):
+        self._engine = None
+        self._sessionmaker = None
+        self._supabase = None
+        self._supabase_async = None  # Realtime 구독, 즐겨찾기 저장용 (동기 클라이언트는 Realtime을 지원하지 않음)
+        self._supabase_async_lock = asyncio.Lock()
+        self._http_clients = {}
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = create_database_engine(DATABASE_URL)
+            self._sessionmaker = async_sessionmaker(self._engine, expire_on_commit=False, autoflush=False)
+        return self._engine
+
+    def session(self):
+        if self._sessionmaker is None:
+            self.engine
+        return self._sessionmaker()
+
+    @property
+    def supabase(self):
+        if self._supabase is None:
+            from supabase import create_client
+            self._supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return self._supabase
+
+    async def supabase_async(self):
+        async with self._supabase_async_lock:
+            if self._supabase_async is None:
+                from supabase import acreate_client
+                self._supabase_async = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+        return self._supabase_async
+
+    def http(self, name):
+        """업스트림 이름("spoonacular", "deepl", "google")별 공용 AsyncClient를 반환합니다."""
+        client = self._http_clients.get(name)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=UPSTREAM_HTTP2,
+                timeout=httpx.Timeout(
+                    connect=UPSTREAM_CONNECT_TIMEOUT,
+                    read=UPSTREAM_READ_TIMEOUT,
+                    write=UPSTREAM_WRITE_TIMEOUT,
+                    pool=UPSTREAM_POOL_TIMEOUT,
+                ),
+                limits=httpx.Limits(
+                    max_connections=UPSTREAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+                    keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._http_clients[name] = client
+        return client
+
+    async def aclose(self):
+        clients = list(self._http_clients.values())
+        self._http_clients.clear()
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+            self._sessionmaker = None
+        self._supabase = None
+        if self._supabase_async is not None:
+            try:
+                await self._supabase_async.remove_all_channels()
+            except Exception as e:
+                logger.warning("❌ Realtime 연결 종료 실패", extra={"fields": {"error": str(e)}})
+            self._supabase_async = None
+
+resources = Resources()
+
+def get_upstream_client(name):
+    return resources.http(name)
+
+# ✅ 시작/종료 관리
+# 시작 시에는 테이블 생성만 기다리고, 캐시 예열은 백그라운드에서 진행합니다. (/ready로 확인)
+DB_CREATE_ALL = os.getenv("DB_CREATE_ALL", "true").lower() == "true"
+PREWARM_RECIPE_IDS = [int(v) for v in os.getenv("PREWARM_RECIPE_IDS", "").split(",") if v.strip()]
+PREWARM_GOOGLE_CERTS = os.getenv("PREWARM_GOOGLE_CERTS", "false").lower() == "true"
+
+class AppState:
+    def __init__(self):
+        self.started = False
+        self.prewarm_task = None
+        self.prewarm_error = None
+
+app_state = AppState()
+
+async def prewarm_caches():
+    current_priority.set(PRIORITY_PREFETCH)  # 사용자 요청보다 뒤로
+    await translation_cache.warm_load()
+    if PREWARM_GOOGLE_CERTS:
+        await google_verifier.get_certs()
+    if PREWARM_RECIPE_IDS:
+        await asyncio.gather(*(
+            get_recipe_detail_async(recipe_id, DETAIL_TRANSLATABLE_FIELDS, "KO") for recipe_id in PREWARM_RECIPE_IDS
+        ))
+
+def on_prewarm_done(task):
+    if not task.cancelled() and task.exception() is not None:
+        app_state.prewarm_error = str(task.exception())
+        logger.warning("❌ 캐시 예열 실패", extra={"fields": {"error": app_state.prewarm_error}})
+
+@asynccontextmanager
+async def lifespan(app):
+    ingredient_glossary.load()
+    if DB_CREATE_ALL:
+        async with resources.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    await favorites_service.recover()
+    app_state.prewarm_task = asyncio.create_task(prewarm_caches())
+    app_state.prewarm_task.add_done_callback(on_prewarm_done)
+    app_state.started = True
+    try:
+        yield
+    finally:
+        # 종료 시 대기 중인 번역 배치/즐겨찾기를 보내고 리소스 정리
+        app_state.started = False
+        if not app_state.prewarm_task.done():
+            app_state.prewarm_task.cancel()
+            await asyncio.gather(app_state.prewarm_task, return_exceptions=True)
+        await favorites_service.aclose()
+        await recipe_detail_cache.aclose()
+        await deepl_batcher.aclose()
+        await translation_cache.aclose()
+        await resources.aclose()
+
+# ✅ 빠른 JSON 직렬화 (orjson이 설치되어 있을 때만 사용)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+# ✅ 응답 압축 (Accept-Encoding에 따라 brotli 또는 gzip)
+# 한 번에 보내는 응답만 압축하고, 스트리밍 응답(more_body)은 버퍼링하지 않고 그대로 흘려보냅니다.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))       # 이보다 작은 응답은 압축하지 않음 (바이트)
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+try:
+    import brotli  # 설치되어 있을 때만 br 사용
+except ImportError:
+    brotli = None
+
+def negotiate_encoding(accept_encoding):
+    # "gzip, deflate, br;q=0.9" → 지원하는 인코딩 중 q값이 가장 높은 것 (동률이면 br 우선)
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(candidates, key=lambda name: weights.get(name, weights.get("*", 0.0)))
+    return best if weights.get(best, weights.get("*", 0.0)) > 0 else None
+
+def compress_body(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL)
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        pending_start = None
+
+        async def send_wrapper(message):
+            nonlocal pending_start
+            if message["type"] == "http.response.start":
+                pending_start = message  # 첫 body를 보고 압축 여부를 정함
+                return
+            if message["type"] != "http.response.body" or pending_start is None:
+                return await send(message)
+
+            start, pending_start = pending_start, None
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                return await send(message)
+
+            body = compress_body(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag  # 압축된 표현은 바이트가 다르므로 약한 ETag
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+# ✅ 비싼 엔드포인트 입장 제어 (동시 처리 수 제한 + 사용자별 공정 분배)
+# 엔드포인트마다 동시에 처리할 요청 수와 대기열 길이를 제한하고, 넘치면 바로 503 + Retry-After로 응답합니다.
+# 대기열은 사용자별로 나눠 번갈아 꺼내므로 한 사용자가 요청을 몰아 보내도 다른 사용자가 밀리지 않으며,
+# 한 사용자가 동시에 처리/대기할 수 있는 요청 수를 넘기면 429로 응답합니다.
+# 사용자는 X-User-Id 헤더로 구분하고, 없으면 클라이언트 IP를 사용합니다.
+# X-User-Id는 인증되지 않은 헤더이므로, 헤더를 바꿔 가며 보내는 경우를 막기 위해 클라이언트 IP당 요청 수도 따로 제한합니다.
+ADMISSION_ENDPOINTS = {
+    # path: (이름, 기본 동시 처리 수, 기본 대기열 길이)
+    "/get_recipes/": ("RECIPES", 16, 64),
+    "/get_recipes_by_percent/": ("PERCENT", 4, 16),
+    "/get_multiple_recipe_details/": ("MULTI_DETAIL", 4, 16),
+    "/get_substitutes_batch/": ("SUBSTITUTES_BATCH", 4, 16),
+}
+ADMISSION_MAX_PER_USER = int(os.getenv("ADMISSION_MAX_PER_USER", "2"))          # 엔드포인트별 사용자당 처리+대기 요청 수
+ADMISSION_MAX_PER_IP = int(os.getenv("ADMISSION_MAX_PER_IP", "8"))              # 엔드포인트별 IP당 처리+대기 요청 수 (NAT 뒤 여러 사용자 고려)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))      # 대기열에서 기다리는 최대 시간 (초)
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "2"))            # 503 응답의 Retry-After (초)
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code, reason, retry_after):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+class EndpointAdmission:
+    def __init__(self, path, concurrency, max_queue, max_per_user=ADMISSION_MAX_PER_USER, queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+                 max_per_ip=ADMISSION_MAX_PER_IP):
+        self.path = path
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.max_per_ip = max_per_ip
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.users = {}               # user -> 처리 중 + 대기 중인 요청 수
+        self.ips = {}                 # 클라이언트 IP -> 처리 중 + 대기 중인 요청 수
+        self.queues = OrderedDict()   # user -> 대기 중인 future (사용자 순서대로 돌아가며 꺼냄)
+
+    async def acquire(self, user, ip=None):
+        if self.users.get(user, 0) >= self.max_per_user:
+            raise AdmissionRejected(429, "user_limit", 1)
+        if ip is not None and self.ips.get(ip, 0) >= self.max_per_ip:
+            raise AdmissionRejected(429, "ip_limit", 1)
+        if self.active < self.concurrency and not self.waiting:
+            self.active += 1
+            self._enter(user, ip)
+            return
+        if self.waiting >= self.max_queue:
+            raise AdmissionRejected(503, "queue_full", ADMISSION_RETRY_AFTER)
+
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(user, deque()).append(future)
+        self.waiting += 1
+        self._enter(user, ip)
+        ADMISSION_QUEUED.labels(self.path).inc()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                self.release(user, ip)  # 슬롯을 넘겨받은 직후 취소됨 → 다음 대기자에게 넘김
+            else:
+                self._remove_waiter(user, future)
+                self._leave(user, ip)
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionRejected(503, "queue_timeout", ADMISSION_RETRY_AFTER) from None
+            raise
+
+    def release(self, user, ip=None):
+        self._leave(user, ip)
+        while self.queues:
+            # 가장 오래 기다린 사용자의 첫 요청에 슬롯을 넘기고, 그 사용자는 맨 뒤로 보냄
+            next_user, waiters = next(iter(self.queues.items()))
+            future = waiters.popleft()
+            if waiters:
+                self.queues.move_to_end(next_user)
+            else:
+                del self.queues[next_user]
+            self.waiting -= 1
+            ADMISSION_QUEUED.labels(self.path).dec()
+            if not future.done():
+                future.set_result(None)  # 슬롯을 그대로 넘겨주므로 active는 변하지 않음
+                return
+        self.active -= 1
+
+    def _remove_waiter(self, user, future):
+        waiters = self.queues.get(user)
+        if waiters is None or future not in waiters:
+            return
+        waiters.remove(future)
+        if not waiters:
+            del self.queues[user]
+        self.waiting -= 1
+        ADMISSION_QUEUED.labels(self.path).dec()
+
+    def _enter(self, user, ip):
+        self.users[user] = self.users.get(user, 0) + 1
+        if ip is not None:
+            self.ips[ip] = self.ips.get(ip, 0) + 1
+
+    def _leave(self, user, ip):
+        for counts, key in ((self.users, user), (self.ips, ip)):
+            if key is None:
+                continue
+            count = counts.get(key, 0) - 1
+            if count > 0:
+                counts[key] = count
+            else:
+                counts.pop(key, None)
+
+    def stats(self):
+        return {"active": self.active, "waiting": self.waiting, "users": len(self.users), "ips": len(self.ips)}
+
+def admission_client_ip(scope):
+    client = scope.get("client")
+    return client[0] if client else None
+
+def admission_user(scope):
+    user_id = Headers(scope=scope).get("x-user-id", "").strip()
+    if user_id:
+        return f"user:{user_id[:128]}"
+    ip = admission_client_ip(scope)
+    return f"ip:{ip}" if ip else "anonymous"
+
+class AdmissionControlMiddleware:
+    # 스트리밍 응답이 끝날 때까지 슬롯을 잡고 있도록 순수 ASGI 미들웨어로 구현
+    def __init__(self, app, endpoints=None):
+        self.app = app
+        self.endpoints = endpoints if endpoints is not None else admission_endpoints
+
+    async def __call__(self, scope, receive, send):
+        admission = self.endpoints.get(scope.get("path")) if scope["type"] == "http" else None
+        if admission is None or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        user = admission_user(scope)
+        ip = admission_client_ip(scope)
+        try:
+            await admission.acquire(user, ip)
+        except AdmissionRejected as e:
+            ADMISSION_REJECTED.labels(admission.path, e.reason).inc()
+            detail = "❌ 요청이 너무 많습니다. 잠시 후 다시 시도해주세요." if e.status_code == 429 else "❌ 서버가 혼잡합니다. 잠시 후 다시 시도해주세요."
+            response = FastJSONResponse(
+                status_code=e.status_code, content={"detail": detail}, headers={"Retry-After": str(e.retry_after)}
+            )
+            return await response(scope, receive, send)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release(user, ip)
+
+admission_endpoints = {
+    path: EndpointAdmission(
+        path,
+        int(os.getenv(f"ADMISSION_{name}_CONCURRENCY", str(concurrency))),
+        int(os.getenv(f"ADMISSION_{name}_QUEUE", str(max_queue))),
+    )
+    for path, (name, concurrency, max_queue) in ADMISSION_ENDPOINTS.items()
+}
 
 # FastAPI 인스턴스
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # CORS 미들웨어 설정
 origins = [
@@ -36,6 +560,10 @@ origins = [
     "*"  # 개발 중에는 모든 origin 허용
 ]
 
+app.add_middleware(AdmissionControlMiddleware)  # CORS/메트릭 안쪽에 두어 거절 응답에도 CORS 헤더가 붙고 측정됨
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -45,32 +573,66 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
-# 환경변수 불러오기
-load_dotenv()
 SPOONACULAR_API_KEY = os.getenv("SPOONACULAR_API_KEY")
 DEEPL_API_KEY = os.getenv("DEEPL_API_KEY")
 
-# Supabase 클라이언트 초기화
+# Supabase 접속 정보 (클라이언트는 resources.supabase에서 처음 사용할 때 생성)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-from supabase import create_client
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-# API 주소
-SPOONACULAR_COMPLEX_SEARCH_URL = "https://api.spoonacular.com/recipes/complexSearch"
-SPOONACULAR_RECIPE_URL = "https://api.spoonacular.com/recipes/findByIngredients"
-SUBSTITUTE_URL = "https://api.spoonacular.com/food/ingredients/substitutes"
-DEEPL_URL = "https://api-free.deepl.com/v2/translate"
-RECIPE_INFO_URL = "https://api.spoonacular.com/recipes/{id}/information"
+# API 주소 (벤치마크/테스트에서는 환경변수로 로컬 가짜 서버를 가리킬 수 있음)
+SPOONACULAR_BASE_URL = os.getenv("SPOONACULAR_BASE_URL", "https://api.spoonacular.com").rstrip("/")
+SPOONACULAR_COMPLEX_SEARCH_URL = f"{SPOONACULAR_BASE_URL}/recipes/complexSearch"
+SUBSTITUTE_URL = f"{SPOONACULAR_BASE_URL}/food/ingredients/substitutes"
+DEEPL_URL = os.getenv("DEEPL_URL", "https://api-free.deepl.com/v2/translate")
+RECIPE_INFO_URL = SPOONACULAR_BASE_URL + "/recipes/{id}/information"
 
 # 구글 OAuth 클라이언트 ID
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 
 # PostgreSQL 접속 정보 (환경변수로 관리 추천)
-DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./taste_trip.db")  # 로컬 실행 시 SQLite 사용
+
+# 비동기 커넥션 풀 설정 (워커당)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))    # 커넥션 대기 최대 시간 (초)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))    # 커넥션 재생성 주기 (초)
+
+def async_database_url(url):
+    # 동기 드라이버 URL을 비동기 드라이버(asyncpg / aiosqlite) URL로 변환
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            url = "postgresql+asyncpg://" + url[len(prefix):]
+            return url.replace("sslmode=", "ssl=")  # asyncpg는 sslmode 대신 ssl 사용
+    return url
+
+def create_database_engine(url):
+    if url.startswith("sqlite"):
+        return create_async_engine(async_database_url(url))
+    return create_async_engine(
+        async_database_url(url),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+def upsert_statement(model, rows, conflict_columns):
+    # INSERT ... ON CONFLICT DO UPDATE. 같은 키를 다른 배치/워커가 동시에 저장해도 충돌 없이 마지막 값으로 덮어씀
+    # 지원하지 않는 DB면 None (호출자가 행 단위 merge로 처리)
+    insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(resources.engine.dialect.name)
+    if insert is None:
+        return None
+    stmt = insert(model).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=conflict_columns,
+        set_={column: stmt.excluded[column] for column in rows[0] if column not in conflict_columns},
+    )
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 class User(Base):
@@ -86,6 +648,29 @@ class UserPreferences(Base):
     diet       = Column(String, nullable=True)  # JSON 문자열로 저장
     allergies  = Column(String, nullable=True)  # CSV 문자열로 저장
 
+class TranslationCacheEntry(Base):
+    __tablename__ = "translation_cache"
+    key             = Column(String(64), primary_key=True)  # 정규화된 텍스트 + target_lang의 SHA-256
+    target_lang     = Column(String(8))
+    source_text     = Column(Text)
+    translated_text = Column(Text)
+    created_at      = Column(Float, index=True)             # time.time()
+
+class IngredientSubstitutesEntry(Base):
+    __tablename__ = "ingredient_substitutes"
+    ingredient  = Column(String(255), primary_key=True)  # normalize_ingredient_name으로 정규화된 영어 재료명
+    substitutes = Column(Text)                           # Spoonacular 대체 재료 문장 목록 (JSON, 영어 원문)
+    fetched_at  = Column(Float, index=True)              # time.time()
+
+class FavoriteOutboxEntry(Base):
+    # Supabase 저장에 실패한 즐겨찾기. 저장될 때까지 보관하고 재시작 시 다시 보냄
+    __tablename__ = "favorites_outbox"
+    user_id      = Column(String, primary_key=True)
+    recipe_id    = Column(Integer, primary_key=True)
+    recipe_title = Column(Text)
+    recipe_image = Column(Text)
+    created_at   = Column(Float)                      # time.time()
+
 # relationship 설정 (선택)
 User.preferences = relationship(
     "UserPreferences",
@@ -94,251 +679,1467 @@ User.preferences = relationship(
     cascade="all, delete-orphan"
 )
 
-# 간단한 인메모리 번역 캐시
-translation_cache = {}
+# ✅ 크기 제한 + TTL을 가진 인메모리 LRU 캐시
+class TTLCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, expires_at)
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)  # 가장 오래 사용되지 않은 항목 제거
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# ✅ 2단계 번역 캐시 (인메모리 LRU → DB 테이블)
+# DB 계층은 재시작/재배포 후에도 유지되고 여러 uvicorn 워커가 함께 사용합니다.
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "50000"))
+TRANSLATION_CACHE_TTL = float(os.getenv("TRANSLATION_CACHE_TTL", str(60 * 60 * 24)))          # 인메모리 TTL (초)
+TRANSLATION_DB_TTL = float(os.getenv("TRANSLATION_DB_TTL", str(60 * 60 * 24 * 90)))           # DB TTL (초)
+TRANSLATION_CACHE_WARM_ENTRIES = int(os.getenv("TRANSLATION_CACHE_WARM_ENTRIES", "10000"))   # 시작 시 미리 올릴 개수
+# DB 조회/저장은 요청마다 세션을 열지 않고 모아서 처리합니다.
+# - 조회: TRANSLATION_DB_READ_WINDOW_MS 동안 모인 키를 WHERE key IN (...) 한 번으로 조회
+# - 저장: 응답을 기다리게 하지 않고 백그라운드에서 TRANSLATION_DB_WRITE_WINDOW_MS마다 한 트랜잭션으로 저장
+TRANSLATION_DB_READ_WINDOW_MS = float(os.getenv("TRANSLATION_DB_READ_WINDOW_MS", "2"))
+TRANSLATION_DB_WRITE_WINDOW_MS = float(os.getenv("TRANSLATION_DB_WRITE_WINDOW_MS", "200"))
+TRANSLATION_DB_BATCH_SIZE = int(os.getenv("TRANSLATION_DB_BATCH_SIZE", "500"))
+TRANSLATION_DB_PRUNE_INTERVAL = float(os.getenv("TRANSLATION_DB_PRUNE_INTERVAL", str(60 * 60)))  # DB TTL 지난 행 삭제 주기 (초)
+
+class TranslationCache:
+    def __init__(self, maxsize=TRANSLATION_CACHE_MAX_ENTRIES, ttl=TRANSLATION_CACHE_TTL, db_ttl=TRANSLATION_DB_TTL):
+        self.memory = TTLCache(maxsize, ttl)
+        self.db_ttl = db_ttl
+        self._read_pending = {}   # key -> [future, ...]
+        self._read_timer = None
+        self._write_pending = {}  # key -> 저장할 행 (같은 키는 마지막 값만 저장)
+        self._write_timer = None
+        self._next_prune = 0.0    # 다음 만료 행 삭제 시각 (time.monotonic() 기준)
+        self._tasks = set()       # 진행 중인 조회/저장 태스크
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text, target_lang, tag_handling=None):
+        # 유니코드/공백을 정규화한 뒤 해시하여 키 길이를 고정합니다.
+        # tag_handling("html")으로 번역한 결과는 엔티티 처리가 다르므로 별도 키를 씁니다.
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        lang = target_lang.upper() if tag_handling is None else f"{target_lang.upper()}\0{tag_handling}"
+        return hashlib.sha256(f"{lang}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def peek(self, text, target_lang, tag_handling=None):
+        # 인메모리만 조회 (await 없음). 없으면 None
+        value = self.memory.get(self.make_key(text, target_lang, tag_handling))
+        if value is not None:
+            self.memory_hits += 1
+            TRANSLATION_CACHE_LOOKUPS.labels("memory_hit").inc()
+        return value
+
+    async def get(self, text, target_lang, tag_handling=None):
+        value = self.peek(text, target_lang, tag_handling)
+        if value is not None:
+            return value
+
+        key = self.make_key(text, target_lang, tag_handling)
+        value = await self._load(key)
+        if value is not None:
+            self.db_hits += 1
+            TRANSLATION_CACHE_LOOKUPS.labels("db_hit").inc()
+            self.memory.set(key, value)
+            return value
+
+        self.misses += 1
+        TRANSLATION_CACHE_LOOKUPS.labels("miss").inc()
+        return None
+
+    async def set(self, text, target_lang, translated_text, tag_handling=None):
+        key = self.make_key(text, target_lang, tag_handling)
+        self.memory.set(key, translated_text)
+        self._write_pending[key] = {
+            "key": key,
+            "target_lang": target_lang.upper(),
+            "source_text": text,
+            "translated_text": translated_text,
+            "created_at": time.time(),
+        }
+        if len(self._write_pending) >= TRANSLATION_DB_BATCH_SIZE:
+            self._flush_writes()
+        elif self._write_timer is None:
+            self._write_timer = asyncio.get_running_loop().call_later(
+                TRANSLATION_DB_WRITE_WINDOW_MS / 1000, self._flush_writes
+            )
+
+    async def _load(self, key):
+        future = asyncio.get_running_loop().create_future()
+        self._read_pending.setdefault(key, []).append(future)
+        if len(self._read_pending) >= TRANSLATION_DB_BATCH_SIZE:
+            self._flush_reads()
+        elif self._read_timer is None:
+            self._read_timer = asyncio.get_running_loop().call_later(
+                TRANSLATION_DB_READ_WINDOW_MS / 1000, self._flush_reads
+            )
+        return await future
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _flush_reads(self):
+        if self._read_timer is not None:
+            self._read_timer.cancel()
+            self._read_timer = None
+        pending, self._read_pending = self._read_pending, {}
+        if pending:
+            self._spawn(self._read_batch(pending))
+
+    async def _read_batch(self, pending):
+        found = {}
+        try:
+            async with resources.session() as db:
+                result = await db.execute(
+                    select(TranslationCacheEntry.key, TranslationCacheEntry.translated_text)
+                    .where(TranslationCacheEntry.key.in_(list(pending)))
+                    .where(TranslationCacheEntry.created_at >= time.time() - self.db_ttl)
+                )
+                found = dict(result.all())
+        except Exception as e:
+            logger.warning("❌ 번역 캐시 조회 실패", extra={"fields": {"keys": len(pending), "error": str(e)}})
+        for key, futures in pending.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(found.get(key))
+
+    def _flush_writes(self):
+        if self._write_timer is not None:
+            self._write_timer.cancel()
+            self._write_timer = None
+        pending, self._write_pending = self._write_pending, {}
+        if pending:
+            self._spawn(self._write_batch(pending))
+
+    async def _write_batch(self, pending):
+        rows = list(pending.values())
+        try:
+            async with resources.session() as db:
+                stmt = upsert_statement(TranslationCacheEntry, rows, ["key"])
+                if stmt is not None:
+                    await db.execute(stmt)
+                    await db.commit()
+                else:
+                    for row in rows:
+                        try:
+                            await db.merge(TranslationCacheEntry(**row))
+                            await db.commit()  # 한 행의 충돌이 나머지 행을 되돌리지 않도록 행마다 커밋
+                        except IntegrityError:
+                            await db.rollback()  # 다른 워커가 같은 키를 먼저 저장함
+                if time.monotonic() >= self._next_prune:
+                    await self._prune(db)
+        except Exception as e:
+            logger.warning("❌ 번역 캐시 저장 실패", extra={"fields": {"entries": len(rows), "error": str(e)}})
 
-# 비동기 번역 함수 (DeepL API Pro Plan 필요)
-async def translate_with_deepl_async(text, target_lang="EN"):
-    if not text:
-        return text # 빈 텍스트는 번역하지 않음
+    async def _prune(self, db):
+        # DB TTL이 지난 행은 조회되지 않으므로 주기적으로 삭제해 테이블 크기를 제한
+        self._next_prune = time.monotonic() + TRANSLATION_DB_PRUNE_INTERVAL
+        result = await db.execute(
+            delete(TranslationCacheEntry).where(TranslationCacheEntry.created_at < time.time() - self.db_ttl)
+        )
+        await db.commit()
+        if result.rowcount:
+            logger.info("🧹 만료된 번역 캐시 삭제", extra={"fields": {"rows": result.rowcount}})
+
+    async def aclose(self):
+        # 종료 시 남은 조회/저장을 마무리
+        self._flush_reads()
+        self._flush_writes()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def warm_load(self, limit=TRANSLATION_CACHE_WARM_ENTRIES):
+        # 최근에 저장된 번역을 인메모리 캐시에 미리 올려둡니다. (시작 시 1회)
+        async with resources.session() as db:
+            result = await db.execute(
+                select(TranslationCacheEntry.key, TranslationCacheEntry.translated_text)
+                .where(TranslationCacheEntry.created_at >= time.time() - self.db_ttl)
+                .order_by(TranslationCacheEntry.created_at.desc())
+                .limit(limit)
+            )
+            entries = result.all()
+        for key, translated_text in reversed(entries):
+            self.memory.set(key, translated_text)
+        return len(entries)
+
+    def stats(self):
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "entries": len(self.memory),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.db_hits) / lookups if lookups else 0.0,
+        }
 
-    # 캐시 확인
-    cache_key = f"{text}_{target_lang}"
-    if cache_key in translation_cache:
-        # print(f"✅ 캐시 사용: {text[:20]}...") # 디버깅용 (선택 사항)
-        return translation_cache[cache_key]
+translation_cache = TranslationCache()
+TRANSLATION_CACHE_HIT_RATIO.set_function(lambda: translation_cache.stats()["hit_ratio"])
+
+# ✅ DeepL 마이크로 배칭 번역기
+# DeepL은 한 요청에 여러 개의 text 파라미터를 받을 수 있으므로, 짧은 시간 동안 들어온
+# 번역 요청을 target_lang별로 모아 한 번의 API 호출로 보냅니다.
+# (한 요청 안의 병렬 번역뿐 아니라 동시에 들어온 다른 요청의 번역도 함께 묶입니다.)
+DEEPL_BATCH_WINDOW_MS = float(os.getenv("DEEPL_BATCH_WINDOW_MS", "10"))
+DEEPL_BATCH_MAX_TEXTS = int(os.getenv("DEEPL_BATCH_MAX_TEXTS", "50"))     # DeepL 요청당 최대 text 개수
+DEEPL_BATCH_MAX_CHARS = int(os.getenv("DEEPL_BATCH_MAX_CHARS", "30000"))  # 요청 본문 크기 제한 대비
+
+class TranslationError(Exception):
+    pass
+
+class DeepLBatchTranslator:
+    def __init__(self, window_ms=DEEPL_BATCH_WINDOW_MS, max_texts=DEEPL_BATCH_MAX_TEXTS, max_chars=DEEPL_BATCH_MAX_CHARS):
+        self.window = window_ms / 1000
+        self.max_texts = max_texts
+        self.max_chars = max_chars
+        # 배치는 (target_lang, tag_handling) 그룹별로 모읍니다.
+        self._pending = {}        # group -> {text: [future, ...]}
+        self._pending_chars = {}  # group -> 대기 중인 글자 수
+        self._timers = {}         # group -> 예약된 flush 타이머
+        self._priorities = {}     # group -> 배치에 포함된 호출 중 가장 높은 우선순위
+        self._tasks = set()       # 전송 중인 배치 태스크
+
+    async def translate(self, text, target_lang, tag_handling=None):
+        group = (target_lang.upper(), tag_handling)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self._pending.setdefault(group, {})
+        if text not in batch:
+            self._pending_chars[group] = self._pending_chars.get(group, 0) + len(text)
+        batch.setdefault(text, []).append(future)  # 같은 텍스트는 한 번만 전송
+        self._priorities[group] = min(self._priorities.get(group, PRIORITY_BATCH), current_priority.get())
+
+        if len(batch) >= self.max_texts or self._pending_chars[group] >= self.max_chars:
+            self._flush(group)
+        elif group not in self._timers:
+            self._timers[group] = loop.call_later(self.window, self._flush, group)
+
+        return await future
+
+    def _flush(self, group):
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(group, None)
+        self._pending_chars.pop(group, None)
+        priority = self._priorities.pop(group, PRIORITY_INTERACTIVE)
+        if not batch:
+            return
+        task = asyncio.create_task(self._send(group, batch, priority))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, group, batch, priority):
+        target_lang, tag_handling = group
+        texts = list(batch)
+        data = {
+            "auth_key": DEEPL_API_KEY,
+            "text": texts,  # 여러 개의 text 파라미터로 전송
+            "target_lang": target_lang
+        }
+        if tag_handling is not None:
+            data["tag_handling"] = tag_handling
+        try:
+            await deepl_scheduler.acquire(priority)
+            client = get_upstream_client("deepl")
+            DEEPL_CHARACTERS.labels(target_lang).inc(sum(len(text) for text in texts))
+            try:
+                async with track_upstream("deepl") as call:
+                    response = await client.post(DEEPL_URL, data=data)
+                    call["status"] = response.status_code
+            except httpx.TransportError:
+                deepl_scheduler.record_failure()
+                raise
+            deepl_scheduler.record(response.status_code, response.headers)
+            if response.status_code != 200:
+                raise TranslationError(f"번역 실패 ({response.status_code}): {response.text}")
+            translations = response.json()["translations"]
+            if len(translations) != len(texts):
+                raise TranslationError("번역 결과 개수가 요청과 다릅니다.")
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for text, translation in zip(texts, translations):
+            for future in batch[text]:
+                if not future.done():  # 취소된 호출자는 건너뜀
+                    future.set_result(translation["text"])
+
+    async def aclose(self):
+        # 대기 중인 배치를 모두 보내고 전송이 끝날 때까지 기다립니다.
+        for group in list(self._pending):
+            self._flush(group)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+deepl_batcher = DeepLBatchTranslator()
+
+# ✅ 요청별 처리 시간 예산 (deadline)
+# 엔드포인트에서 정한 마감 시간을 contextvar로 전달해, 그 안의 모든 업스트림 대기가 같은 마감 시간을 따릅니다.
+# 번역이 마감 시간을 넘기면 원문을 그대로 쓰고 partial로 표시합니다. (partial 결과는 캐시하지 않음)
+# 검색어 번역, 레시피 검색/원본 조회처럼 원문으로 대체할 수 없는 호출은 DeadlineExceeded를 그대로 올려 504로 응답합니다.
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", "8"))
+PERCENT_REQUEST_BUDGET_SECONDS = float(os.getenv("PERCENT_REQUEST_BUDGET_SECONDS", "12"))   # 여러 페이지를 채점
+BATCH_REQUEST_BUDGET_SECONDS = float(os.getenv("BATCH_REQUEST_BUDGET_SECONDS", "15"))       # 여러 레시피/재료 일괄 조회
+
+class DeadlineExceeded(Exception):
+    pass
+
+class RequestBudget:
+    def __init__(self, deadline=None, parent=None):
+        self.deadline = deadline  # time.monotonic() 기준 절대 시각. None이면 제한 없음
+        self.parent = parent
+        self.partial = False
+
+    def remaining(self):
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def mark_partial(self):
+        budget = self
+        while budget is not None:
+            budget.partial = True
+            budget = budget.parent
+
+current_budget = contextvars.ContextVar("current_budget", default=None)
+
+@contextmanager
+def request_budget(seconds):
+    budget = RequestBudget(time.monotonic() + seconds)
+    token = current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        current_budget.reset(token)
+
+@contextmanager
+def budget_scope():
+    # 부모와 같은 마감 시간을 쓰면서 이 범위 안에서 생긴 partial만 따로 확인할 때 사용 (캐시 저장 여부 판단)
+    parent = current_budget.get()
+    budget = RequestBudget(parent.deadline if parent else None, parent)
+    token = current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        current_budget.reset(token)
+
+async def within_budget(awaitable):
+    budget = current_budget.get()
+    remaining = budget.remaining() if budget is not None else None
+    if remaining is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, remaining)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded() from None
+
+def mark_partial():
+    budget = current_budget.get()
+    if budget is not None:
+        budget.mark_partial()
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request, exc):
+    # 부분 결과로 대체할 수 없는 호출이 예산을 넘긴 경우
+    return FastJSONResponse(status_code=504, content={"detail": "⏱ 처리 시간이 초과되었습니다."})
+
+# ✅ 업스트림 호출 스케줄러 (쿼터 / 우선순위 / 서킷 브레이커)
+# 업스트림별 토큰 버킷으로 초당 호출 수를 제한하고, 토큰이 없으면 우선순위 순서로 대기합니다.
+# (사용자 요청 > 캐시 예열·백그라운드 갱신 > 일괄 조회)
+# 429/5xx가 이어지면 서킷을 열어 호출 없이 바로 UpstreamUnavailable을 내고, 호출자는 캐시된 데이터로 응답합니다.
+# 대신할 캐시가 없으면 UpstreamUnavailable을 그대로 올려 503 + Retry-After로 응답합니다.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREFETCH = 1
+PRIORITY_BATCH = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_PREFETCH: "prefetch", PRIORITY_BATCH: "batch"}
+
+current_priority = contextvars.ContextVar("current_priority", default=PRIORITY_INTERACTIVE)
+
+@contextmanager
+def request_priority(priority):
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+# 토큰 버킷은 워커(프로세스)마다 따로 있으므로, 기본값은 요금제의 초당 한도를 워커 수로 나눈 값
+# WEB_CONCURRENCY는 uvicorn --workers의 기본값으로도 쓰이는 환경변수
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+SPOONACULAR_PLAN_RATE_PER_SECOND = float(os.getenv("SPOONACULAR_PLAN_RATE_PER_SECOND", "20"))  # 요금제 한도 (전체 워커 합계)
+SPOONACULAR_RATE_PER_SECOND = float(os.getenv("SPOONACULAR_RATE_PER_SECOND", str(SPOONACULAR_PLAN_RATE_PER_SECOND / WEB_CONCURRENCY)))
+SPOONACULAR_BURST = int(os.getenv("SPOONACULAR_BURST", str(max(1, round(SPOONACULAR_RATE_PER_SECOND * 2)))))
+SPOONACULAR_QUOTA_RESERVE = float(os.getenv("SPOONACULAR_QUOTA_RESERVE", "20"))  # 남은 포인트가 이보다 적으면 사용자 요청만 허용
+DEEPL_PLAN_RATE_PER_SECOND = float(os.getenv("DEEPL_PLAN_RATE_PER_SECOND", "50"))
+DEEPL_RATE_PER_SECOND = float(os.getenv("DEEPL_RATE_PER_SECOND", str(DEEPL_PLAN_RATE_PER_SECOND / WEB_CONCURRENCY)))
+DEEPL_BURST = int(os.getenv("DEEPL_BURST", str(max(1, round(DEEPL_RATE_PER_SECOND * 2)))))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))          # 연속 실패 횟수
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+QUOTA_EXHAUSTED_OPEN_SECONDS = float(os.getenv("QUOTA_EXHAUSTED_OPEN_SECONDS", str(60 * 10)))
+UPSTREAM_ERROR_RETRY_AFTER = float(os.getenv("UPSTREAM_ERROR_RETRY_AFTER", "5"))  # 업스트림 오류 응답을 503으로 돌려줄 때의 Retry-After (초)
+QUOTA_EXHAUSTED_STATUS = {402, 456}  # Spoonacular 일일 포인트 소진 / DeepL 글자 수 쿼터 초과
+
+class UpstreamUnavailable(Exception):
+    def __init__(self, upstream, retry_after):
+        super().__init__(f"{upstream} 호출 불가 ({retry_after:.0f}초 후 재시도)")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+def parse_retry_after(headers, default):
+    value = headers.get("retry-after") if headers is not None else None
+    try:
+        return max(1.0, float(value))
+    except (TypeError, ValueError):
+        return default
+
+class UpstreamScheduler:
+    def __init__(self, name, rate, burst, quota_reserve=None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.quota_reserve = quota_reserve
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._waiters = []  # (priority, 순번, future) 힙
+        self._seq = itertools.count()
+        self._timer = None
+        # 서킷 브레이커
+        self.state = "closed"  # closed | open | half_open
+        self.failures = 0
+        self.open_until = 0.0
+        self.quota_used = None
+        self.quota_left = None
+        UPSTREAM_CIRCUIT_OPEN.labels(name).set(0)
+
+    async def acquire(self, priority=None):
+        # 호출 직전에 사용. 서킷이 열려 있거나 쿼터를 아껴야 하면 바로 UpstreamUnavailable
+        priority = current_priority.get() if priority is None else priority
+        self._reject_if_unavailable(priority)
+        self._refill()
+        if self.tokens >= 1 and not self._waiters:
+            self.tokens -= 1
+        else:
+            start = time.monotonic()
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), future))
+            self._schedule_dispatch()
+            await future  # 호출자가 취소되면 future도 취소되어 _dispatch에서 건너뜀
+            UPSTREAM_QUEUE_WAIT.labels(self.name, PRIORITY_NAMES.get(priority, str(priority))).observe(time.monotonic() - start)
 
-    # API 호출 (비동기 클라이언트 사용)
-    async with httpx.AsyncClient() as client:
         try:
-            params = {
-                "auth_key": DEEPL_API_KEY,
-                "text": text,
-                "target_lang": target_lang
-            }
-            # print(f"🌐 DeepL API 호출: {DEEPL_URL}, params: {params.get('text', '')[:20]}...") # 디버깅용 (선택 사항)
-            response = await client.post(DEEPL_URL, data=params)
-
-            if response.status_code == 200:
-                translated_text = response.json()["translations"][0]["text"]
-                # 캐시에 저장
-                translation_cache[cache_key] = translated_text
-                # print(f"🌐 API 호출 후 캐시 저장: {text[:20]}...") # 디버깅용 (선택 사항)
-                return translated_text
+            self._reject_if_unavailable(priority)  # 기다리는 동안 서킷이 열렸을 수 있음
+        except UpstreamUnavailable:
+            self.tokens = min(self.burst, self.tokens + 1)  # 보내지 않은 호출의 토큰은 돌려줌
+            raise
+        if self.state != "closed":
+            # open 기간이 지남 → 시험 호출 하나만 보내고, 결과가 올 때까지 다른 호출은 거절 (half-open)
+            self.open_until = time.monotonic() + CIRCUIT_OPEN_SECONDS
+            self._set_state("half_open")
+
+    def _reject_if_unavailable(self, priority):
+        now = time.monotonic()
+        if self.state != "closed" and now < self.open_until:
+            UPSTREAM_REJECTED.labels(self.name, "circuit_open").inc()
+            raise UpstreamUnavailable(self.name, self.open_until - now)
+        if (priority > PRIORITY_INTERACTIVE and self.quota_reserve is not None
+                and self.quota_left is not None and self.quota_left < self.quota_reserve):
+            UPSTREAM_REJECTED.labels(self.name, "quota_reserve").inc()
+            raise UpstreamUnavailable(self.name, QUOTA_EXHAUSTED_OPEN_SECONDS)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _schedule_dispatch(self):
+        if self._timer is None:
+            delay = max(0.0, (1 - self.tokens) / self.rate)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _dispatch(self):
+        self._timer = None
+        self._refill()
+        while self._waiters and self.tokens >= 1:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # 취소된 대기자
+            self.tokens -= 1
+            future.set_result(None)
+        if self._waiters:
+            self._schedule_dispatch()
+
+    def record(self, status_code, headers=None):
+        # 업스트림 응답 상태와 쿼터 헤더를 반영
+        if headers is not None:
+            self._read_quota(headers)
+        if status_code in QUOTA_EXHAUSTED_STATUS:
+            self._open(parse_retry_after(headers, QUOTA_EXHAUSTED_OPEN_SECONDS), "quota_exhausted")
+        elif status_code == 429:
+            self._open(parse_retry_after(headers, CIRCUIT_OPEN_SECONDS), "rate_limited")
+        elif status_code >= 500:
+            self.record_failure()
+        else:
+            self.failures = 0
+            if self.state != "closed":
+                logger.info("✅ 서킷 닫힘", extra={"fields": {"upstream": self.name}})
+                self._set_state("closed")
+
+    def record_failure(self):
+        # 5xx 또는 연결 실패
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= CIRCUIT_FAILURE_THRESHOLD:
+            self._open(CIRCUIT_OPEN_SECONDS, "failures")
+
+    def _read_quota(self, headers):
+        # Spoonacular: X-API-Quota-Used / X-API-Quota-Left (포인트)
+        for kind in ("used", "left"):
+            value = headers.get(f"x-api-quota-{kind}")
+            if value is None:
+                continue
+            try:
+                value = float(value)
+            except ValueError:
+                continue
+            setattr(self, f"quota_{kind}", value)
+            UPSTREAM_QUOTA.labels(self.name, kind).set(value)
+        if self.quota_left is not None and self.quota_left <= 0:
+            self._open(QUOTA_EXHAUSTED_OPEN_SECONDS, "quota_exhausted")
+
+    def _open(self, seconds, reason):
+        self.open_until = time.monotonic() + seconds
+        self.failures = 0
+        if self.state != "open":
+            logger.warning("⚡ 서킷 열림", extra={"fields": {"upstream": self.name, "reason": reason, "seconds": seconds}})
+        self._set_state("open")
+
+    def _set_state(self, state):
+        self.state = state
+        UPSTREAM_CIRCUIT_OPEN.labels(self.name).set({"closed": 0, "open": 1, "half_open": 0.5}[state])
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "tokens": round(self.tokens, 2),
+            "queued": sum(1 for _, _, future in self._waiters if not future.done()),
+            "quota_used": self.quota_used,
+            "quota_left": self.quota_left,
+        }
+
+spoonacular_scheduler = UpstreamScheduler(
+    "spoonacular", SPOONACULAR_RATE_PER_SECOND, SPOONACULAR_BURST, quota_reserve=SPOONACULAR_QUOTA_RESERVE
+)
+deepl_scheduler = UpstreamScheduler("deepl", DEEPL_RATE_PER_SECOND, DEEPL_BURST)
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request, exc):
+    # 캐시로 대체할 수 없는 호출이 서킷/쿼터 때문에 거절된 경우
+    return FastJSONResponse(
+        status_code=503,
+        content={"detail": "❌ 외부 API를 일시적으로 사용할 수 없습니다."},
+        headers={"Retry-After": str(max(1, int(exc.retry_after)))},
+    )
+
+# ✅ Single-flight: 동일한 키로 진행 중인 업스트림 호출을 하나로 합칩니다.
+# 캐시는 응답이 돌아온 뒤에야 채워지므로, 그 사이 동시에 들어온 호출자들은
+# 새 호출을 만들지 않고 이미 진행 중인 태스크의 결과(또는 예외)를 함께 기다립니다.
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, func):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        # shield: 한 호출자가 취소되어도 다른 호출자가 기다리는 공유 태스크는 계속 진행
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # 모든 호출자가 취소된 경우에도 예외를 회수하여 경고 방지
+
+single_flight = SingleFlight()
+
+def flight_key(endpoint, params):
+    # (엔드포인트, 정규화된 파라미터) 형태의 키. API 키는 제외합니다.
+    return (endpoint, tuple(sorted(
+        (k, str(v)) for k, v in params.items() if k != "apiKey" and v is not None
+    )))
+
+# ✅ Stale-while-revalidate 캐시
+# soft TTL이 지난 항목은 일단 그대로 돌려주고 백그라운드에서 새로 고칩니다.
+# hard TTL이 지난 항목은 호출자가 직접 다시 불러오고, 다시 불러오기에 실패하면
+# STALE_IF_ERROR_SECONDS 동안은 지난 값을 대신 돌려줍니다. (stale-if-error)
+STALE_IF_ERROR_SECONDS = float(os.getenv("STALE_IF_ERROR_SECONDS", str(60 * 60 * 24)))
+
+class StaleWhileRevalidateCache:
+    def __init__(self, name, soft_ttl, hard_ttl, maxsize, should_cache=lambda value: True):
+        self.name = name
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.maxsize = maxsize
+        self.should_cache = should_cache
+        self._data = OrderedDict()  # key -> (value, fetched_at)
+        self._refreshing = {}       # key -> 백그라운드 갱신 태스크
+        self.hits = 0
+        self.stale_hits = 0
+        self.stale_if_error_hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, key, loader):
+        item = self._data.get(key)
+        stale = None
+        if item is not None:
+            value, fetched_at = item
+            age = time.monotonic() - fetched_at
+            if age < self.hard_ttl:
+                self._data.move_to_end(key)
+                if age >= self.soft_ttl:
+                    self.stale_hits += 1
+                    self._schedule_refresh(key, loader)
+                else:
+                    self.hits += 1
+                return value
+            if age < self.hard_ttl + STALE_IF_ERROR_SECONDS:
+                stale = value
             else:
-                print(f"❌ 번역 실패 ({response.status_code}): {response.text}")
-                return text # 실패 시 원본 텍스트 반환
-        except Exception as e:
-            print(f"❌ 번역 중 오류 발생: {e}")
-            return text # 오류 발생 시 원본 텍스트 반환
+                del self._data[key]
+        self.misses += 1
+        try:
+            value = await self._load(key, loader)
+        except (DeadlineExceeded, UpstreamUnavailable):
+            if stale is None:
+                raise
+            self.stale_if_error_hits += 1
+            return stale
+        if stale is not None and not self.should_cache(value):
+            self.stale_if_error_hits += 1
+            return stale  # 업스트림 실패(서킷 열림 등) 시 지난 값으로 응답
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (value, time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    async def _load(self, key, loader):
+        async def load_and_store():
+            value = await loader()
+            if self.should_cache(value):
+                self.set(key, value)
+            return value
+
+        return await single_flight.do((self.name, key), load_and_store)
+
+    def _schedule_refresh(self, key, loader):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            current_budget.set(None)  # 백그라운드 갱신은 요청 예산과 무관하게 끝까지 진행
+            current_priority.set(PRIORITY_PREFETCH)
+            return await self._load(key, loader)
+
+        task = asyncio.create_task(refresh())
+        self._refreshing[key] = task
+
+        def done(t):
+            self._refreshing.pop(key, None)
+            if not t.cancelled() and t.exception() is not None:
+                logger.warning("❌ 캐시 갱신 실패", extra={"fields": {"cache": self.name, "key": str(key), "error": str(t.exception())}})
+
+        task.add_done_callback(done)
+
+    async def aclose(self):
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "stale_if_error_hits": self.stale_if_error_hits,
+            "misses": self.misses,
+        }
 
-# 비동기 Spoonacular API 클라이언트
-# 여러 API 호출에서 재사용할 수 있도록 전역 또는 앱 상태로 관리하는 것이 좋습니다.
-# 여기서는 간단하게 함수 내에서 생성합니다.
+# ✅ Spoonacular GET 헤지 요청 (선택)
+# 첫 요청이 SPOONACULAR_HEDGE_DELAY_MS 안에 끝나지 않으면 같은 요청을 하나 더 보내고 먼저 끝난 응답을 사용합니다.
+# GET은 멱등이므로 안전하며, 업스트림이 느려질 때 p99 지연을 줄입니다. 0이면 사용하지 않음
+SPOONACULAR_HEDGE_DELAY_MS = float(os.getenv("SPOONACULAR_HEDGE_DELAY_MS", "0"))
 
-# ✅ 비동기 레시피 추천 함수 (복합 조건)
-async def get_recipes_complex_async(ingredients, allergies=None, cuisine=None, diet=None):
+async def hedged(request, delay):
+    first = asyncio.create_task(request())
+    try:
+        return await asyncio.wait_for(asyncio.shield(first), delay)
+    except asyncio.TimeoutError:
+        pass
+
+    UPSTREAM_HEDGED_REQUESTS.labels("spoonacular").inc()
+    pending = {first, asyncio.create_task(request())}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def spoonacular_get(url, params):
+    params = {**params, "apiKey": SPOONACULAR_API_KEY}
+
+    async def request():
+        await spoonacular_scheduler.acquire()
+        try:
+            async with track_upstream("spoonacular") as call:
+                response = await get_upstream_client("spoonacular").get(url, params=params)
+                call["status"] = response.status_code
+        except httpx.TransportError:
+            spoonacular_scheduler.record_failure()
+            raise
+        spoonacular_scheduler.record(response.status_code, response.headers)
+        return response
+
+    async def fetch():
+        if SPOONACULAR_HEDGE_DELAY_MS > 0:
+            return await hedged(request, SPOONACULAR_HEDGE_DELAY_MS / 1000)
+        return await request()
+
+    return await within_budget(single_flight.do(flight_key(url, params), fetch))
+
+# ✅ 한국어↔영어 재료 용어집
+# 자주 쓰는 재료명은 DeepL 없이 바로 번역합니다. (data/ingredient_glossary.json)
+# 별칭/표기 변형(달걀→egg, eggs→계란)을 지원하고, DeepL로 번역된 짧은 재료명은 학습해서 다음부터 바로 사용합니다.
+GLOSSARY_PATH = os.getenv("GLOSSARY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ingredient_glossary.json"))
+GLOSSARY_MAX_LEARNED = int(os.getenv("GLOSSARY_MAX_LEARNED", "5000"))
+GLOSSARY_TERM_MAX_WORDS = 3  # 이보다 긴 문장/재료 설명("1 cup soy milk")은 용어로 보지 않음
+HANGUL_PATTERN = re.compile(r"[\uac00-\ud7a3]")
+
+def glossary_lang(target_lang):
+    return target_lang.upper().split("-")[0]  # EN-US → EN
+
+def glossary_key(text):
+    text = " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+    if HANGUL_PATTERN.search(text):
+        return text.replace(" ", "")  # "참 기름" → "참기름"
+    return text
+
+def glossary_singular_key(key):
+    # 영어 키의 마지막 단어를 단수형으로 ("cherry tomatoes" → "cherry tomato"). 바뀌지 않으면 None
+    if HANGUL_PATTERN.search(key):
+        return None
+    words = key.split(" ")
+    singular = singularize(words[-1])
+    if singular == words[-1]:
+        return None
+    return " ".join([*words[:-1], singular])
+
+def is_glossary_term(text):
+    return 0 < len(text.split()) <= GLOSSARY_TERM_MAX_WORDS and not any(ch.isdigit() for ch in text)
+
+class IngredientGlossary:
+    def __init__(self):
+        self._terms = {}    # (target_lang, key) -> 번역어. load() 시 통째로 교체
+        self._learned = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path=GLOSSARY_PATH):
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        terms = {}
+        for entry in entries:
+            ko, en = entry["ko"], entry["en"]
+            for alias in [ko, *entry.get("ko_aliases", [])]:
+                terms.setdefault(("EN", glossary_key(alias)), en)
+                terms.setdefault(("KO", glossary_key(alias)), ko)  # 이미 한국어면 대표 표기로
+            for alias in [en, *entry.get("en_aliases", [])]:
+                terms.setdefault(("KO", glossary_key(alias)), ko)
+                terms.setdefault(("EN", glossary_key(alias)), en)
+        self._terms = terms
+        return len(entries)
+
+    def lookup(self, text, target_lang):
+        if not is_glossary_term(text):
+            return None
+        lang, key = glossary_lang(target_lang), glossary_key(text)
+        value = self._terms.get((lang, key)) or self._learned.get((lang, key))
+        if value is None:
+            # 복수형은 단수형이 용어집 항목일 때만 그 항목으로 봄. 뜻이 다른 복수형(peppers는 피망, pepper는 후추)은
+            # 용어집에 별칭으로 적어 두면 위에서 먼저 걸림. 학습된 용어는 단수화하지 않음 ("greens" ≠ 학습된 "green")
+            singular = glossary_singular_key(key)
+            if singular is not None:
+                value = self._terms.get((lang, singular))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def learn(self, text, translated, target_lang):
+        # DeepL 결과 중 원문/번역 모두 짧은 용어이고 실제로 번역된 것만 학습
+        if not (is_glossary_term(text) and is_glossary_term(translated)) or text.strip() == translated.strip():
+            return
+        key = (glossary_lang(target_lang), glossary_key(text))
+        if key in self._terms:
+            return
+        self._learned[key] = translated
+        self._learned.move_to_end(key)
+        while len(self._learned) > GLOSSARY_MAX_LEARNED:
+            self._learned.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "terms": len(self._terms),
+            "learned": len(self._learned),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+ingredient_glossary = IngredientGlossary()
+
+# 비동기 번역 함수 (DeepL API Pro Plan 필요)
+async def translate_with_deepl_async(text, target_lang="EN", tag_handling=None, strict=False):
+    # strict: 원문으로 대체할 수 없는 번역(검색어). 번역하지 못하면 원문 대신 예외를 올림
+    # (예산 초과는 DeadlineExceeded, 서킷 열림/DeepL 오류 응답은 UpstreamUnavailable)
+    if not text:
+        return text # 빈 텍스트는 번역하지 않음
+
+    # 용어집 확인 (DeepL·캐시 조회 없이 바로 반환). HTML 조각은 용어집 대상이 아님
+    term = ingredient_glossary.lookup(text, target_lang) if tag_handling is None else None
+    if term is not None:
+        TRANSLATION_CACHE_LOOKUPS.labels("glossary_hit").inc()
+        return term
+
+    # 인메모리 캐시 확인
+    cached = translation_cache.peek(text, target_lang, tag_handling)
+    if cached is not None:
+        if tag_handling is None:
+            ingredient_glossary.learn(text, cached, target_lang)
+        return cached
+
+    async def translate_and_cache():
+        # DB 조회부터 single-flight 안에서 해야, 다른 호출의 번역이 끝나 가는 사이에 들어온 호출이
+        # DeepL 호출과 캐시 저장을 한 번 더 하지 않음 (인메모리도 다시 확인)
+        cached = await translation_cache.get(text, target_lang, tag_handling)
+        if cached is not None:
+            if tag_handling is None:
+                ingredient_glossary.learn(text, cached, target_lang)
+            return cached
+        # 배칭 번역기를 통해 API 호출 후 캐시에 저장
+        translated_text = await deepl_batcher.translate(text, target_lang, tag_handling)
+        await translation_cache.set(text, target_lang, translated_text, tag_handling)
+        if tag_handling is None:
+            ingredient_glossary.learn(text, translated_text, target_lang)
+        return translated_text
+
+    key = ("deepl", TranslationCache.make_key(text, target_lang, tag_handling))
+    try:
+        return await within_budget(single_flight.do(key, translate_and_cache))
+    except DeadlineExceeded:
+        if strict:
+            raise
+        mark_partial()
+        return text # 예산 초과 시 원문 반환 (번역은 백그라운드에서 끝까지 진행되어 캐시됨)
+    except UpstreamUnavailable:
+        if strict:
+            raise
+        mark_partial()
+        return text # 서킷이 열려 있으면 원문 반환 (캐시하지 않도록 partial 표시)
+    except Exception as e:
+        logger.warning("❌ 번역 중 오류 발생", extra={"fields": {"target_lang": target_lang, "error": str(e)}})
+        if strict:
+            raise UpstreamUnavailable("deepl", UPSTREAM_ERROR_RETRY_AFTER) from e
+        mark_partial()
+        return text # 실패 시 원본 텍스트 반환 (캐시하지 않도록 partial 표시)
+
+# ✅ HTML 문장 단위 분할 번역 (summary, instructions)
+# 긴 HTML을 통째로 번역/캐시하면 "This recipe serves N..." 같은 공통 문장도 레시피마다 새로 번역됩니다.
+# 블록 태그(<p>, <li>, <br> 등)는 구분자로 남기고, 그 사이 텍스트를 문장 단위로 잘라
+# 캐시에 없는 문장만 tag_handling=html로 한 번에 번역한 뒤 원래 순서대로 다시 이어 붙입니다.
+# 인라인 태그(<b>, <a> 등) 안에서는 문장을 자르지 않습니다.
+HTML_TOKEN_PATTERN = re.compile(r"<[^>]*>|[^<]+")
+HTML_TAG_NAME_PATTERN = re.compile(r"</?\s*([a-zA-Z0-9]+)")
+HTML_BLOCK_TAGS = frozenset({
+    "p", "div", "br", "hr", "ol", "ul", "li", "h1", "h2", "h3", "h4", "h5", "h6",
+    "table", "thead", "tbody", "tr", "td", "th", "section", "article", "blockquote", "pre",
+})
+HTML_SEGMENTED_FIELDS = ("summary", "instructions")
+HTML_VOID_TAGS = frozenset({"br", "hr", "img", "input", "meta", "link", "wbr"})
+SENTENCE_END_PATTERN = re.compile(r"([.!?][\"')\]]*)(\s+)")
+HAS_LETTER_PATTERN = re.compile(r"[^\W\d_]")
+
+def html_tag_name(tag):
+    match = HTML_TAG_NAME_PATTERN.match(tag)
+    return match.group(1).lower() if match else ""
+
+def segment_html(html):
+    """HTML을 [(번역 여부, 조각), ...]으로 나눕니다. 조각을 순서대로 이어 붙이면 원문이 됩니다."""
+    parts = []
+
+    def add_sentence(tokens):
+        text = "".join(tokens)
+        stripped = text.strip()
+        if not stripped or not HAS_LETTER_PATTERN.search(re.sub(r"<[^>]*>", "", stripped)):
+            parts.append((False, text))  # 공백/숫자/태그뿐인 조각은 그대로 둠
+            return
+        start = text.index(stripped)
+        if start:
+            parts.append((False, text[:start]))
+        parts.append((True, stripped))
+        if start + len(stripped) < len(text):
+            parts.append((False, text[start + len(stripped):]))
+
+    def add_run(run):
+        sentence = []
+        depth = 0
+        for token in run:
+            if token.startswith("<"):
+                sentence.append(token)
+                if token.startswith("</"):
+                    depth = max(0, depth - 1)
+                elif not token.endswith("/>") and html_tag_name(token) not in HTML_VOID_TAGS:
+                    depth += 1
+                continue
+            if depth:
+                sentence.append(token)
+                continue
+            pos = 0
+            for match in SENTENCE_END_PATTERN.finditer(token):
+                sentence.append(token[pos:match.end(1)])
+                add_sentence(sentence)
+                sentence = []
+                parts.append((False, match.group(2)))
+                pos = match.end()
+            sentence.append(token[pos:])
+        if sentence:
+            add_sentence(sentence)
+
+    run = []
+    for token in HTML_TOKEN_PATTERN.findall(html):
+        if token.startswith("<") and html_tag_name(token) in HTML_BLOCK_TAGS:
+            add_run(run)
+            run = []
+            parts.append((False, token))
+        else:
+            run.append(token)
+    add_run(run)
+    return [(is_text, chunk) for is_text, chunk in parts if chunk]
+
+async def translate_html_async(html, target_lang="KO"):
+    if not html:
+        return html
+    parts = segment_html(html)
+    segments = list(dict.fromkeys(chunk for is_text, chunk in parts if is_text))
+    # 동시에 요청하므로 캐시에 없는 문장들은 배칭 번역기에서 한 번의 DeepL 호출로 묶입니다.
+    translated = await asyncio.gather(*(
+        translate_with_deepl_async(segment, target_lang=target_lang, tag_handling="html") for segment in segments
+    ))
+    mapping = dict(zip(segments, translated))
+    return "".join(mapping[chunk] if is_text else chunk for is_text, chunk in parts)
+
+# ✅ 번역 대상 필드 선택
+# translate 파라미터: 생략하면 전체 번역(기존 동작), "none"이면 번역 안 함, "title,ingredients"처럼 콤마로 지정
+DETAIL_TRANSLATABLE_FIELDS = ("title", "summary", "instructions", "ingredients")
+LIST_TRANSLATABLE_FIELDS = ("title", "ingredients")
+LANG_PATTERN = "^[A-Za-z]{2}(-[A-Za-z]{2,4})?$"  # DeepL target_lang (예: KO, EN-US)
+
+def parse_translate_fields(value, allowed):
+    if value is None:
+        return tuple(allowed)
+    value = value.strip().lower()
+    if value in ("", "none"):
+        return ()
+    fields = {f.strip() for f in value.split(",") if f.strip()}
+    unknown = fields - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"번역할 수 없는 필드: {', '.join(sorted(unknown))}")
+    return tuple(f for f in allowed if f in fields)  # 캐시 키가 일정하도록 순서 고정
+
+# ✅ 목록 응답용 간결한 레시피 모델
+# Spoonacular 원본(analyzedInstructions, 영양 정보, 와인 페어링, 중복된 재료 계량 등) 대신 앱이 쓰는 필드만 보냅니다.
+# fields 파라미터: 생략하면 아래 전체, "id,title_kr,image"처럼 콤마로 지정하면 해당 필드만 (id는 항상 포함)
+class RecipeSummary(BaseModel):
+    id: int
+    title: Optional[str] = None
+    title_kr: Optional[str] = None
+    image: Optional[str] = None
+    readyInMinutes: Optional[int] = None
+    servings: Optional[int] = None
+    sourceUrl: Optional[str] = None
+    ingredients: List[str] = []
+    match_percentage: Optional[str] = None
+
+RECIPE_SUMMARY_FIELDS = tuple(RecipeSummary.model_fields)
+
+def parse_response_fields(value):
+    if value is None or not value.strip():
+        return RECIPE_SUMMARY_FIELDS
+    fields = {f.strip() for f in value.split(",") if f.strip()}
+    unknown = fields - set(RECIPE_SUMMARY_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"지원하지 않는 응답 필드: {', '.join(sorted(unknown))}")
+    fields.add("id")
+    return tuple(f for f in RECIPE_SUMMARY_FIELDS if f in fields)
+
+def compact_recipe(recipe, fields=RECIPE_SUMMARY_FIELDS):
+    if "ingredients" not in recipe:  # 번역 전 원본이면 재료 문장만 추림
+        recipe = dict(recipe, ingredients=[i.get("original", "") for i in recipe.get("extendedIngredients", [])])
+    return RecipeSummary.model_validate(recipe).model_dump(include=set(fields), exclude_none=True)
+
+# ✅ 검색어(재료, 알레르기) 번역 - 검색 1회당 한 번만 수행하고 결과를 아래 함수들로 넘깁니다.
+async def translate_search_terms(ingredients, allergies=None):
     # 재료 및 알레르기 번역 (비동기 병렬 처리)
-    translated_ingredients_tasks = [translate_with_deepl_async(i, target_lang="EN") for i in ingredients]
-    translated_allergies_tasks = [translate_with_deepl_async(a.strip(), target_lang="EN") for a in allergies.split(",")] if allergies else []
+    # 번역되지 않은 한국어로 검색하면 엉뚱한 결과가 나오므로, 번역하지 못하면 검색하지 않고 실패시킴
+    translated_ingredients_tasks = [translate_with_deepl_async(i, target_lang="EN", strict=True) for i in ingredients]
+    translated_allergies_tasks = [translate_with_deepl_async(a.strip(), target_lang="EN", strict=True) for a in allergies.split(",")] if allergies else []
 
     translated_ingredients = await asyncio.gather(*translated_ingredients_tasks)
     translated_allergies = await asyncio.gather(*translated_allergies_tasks)
     translated_allergies = [a for a in translated_allergies if a] # 빈 문자열 제거
+    return translated_ingredients, translated_allergies
 
+# ✅ 복합 검색 원본 결과 조회 (번역 전). 실패 시 None 반환, 예산 초과/서킷 열림 시 예외를 그대로 올림
+async def search_recipes_complex_async(translated_ingredients, translated_allergies, cuisine=None, diet=None, number=5, offset=0):
     params = {
         "includeIngredients": ",".join(translated_ingredients),
         "intolerances": ",".join(translated_allergies),
         "cuisine": cuisine,
         "diet": diet,
-        "number": 5,
+        "number": number,
+        "offset": offset,
         "addRecipeInformation": True,
-        "fillIngredients": True,
-        "apiKey": SPOONACULAR_API_KEY
+        "fillIngredients": True
     }
 
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(SPOONACULAR_COMPLEX_SEARCH_URL, params=params)
+    try:
+        response = await spoonacular_get(SPOONACULAR_COMPLEX_SEARCH_URL, params)
+    except DeadlineExceeded:
+        logger.warning("⏱ 복합 검색 시간 초과", extra={"fields": {"offset": offset}})
+        raise
+    except UpstreamUnavailable as e:
+        logger.warning("⚡ 복합 검색 건너뜀", extra={"fields": {"offset": offset, "error": str(e)}})
+        raise
 
     if response.status_code != 200:
-        print(f"❌ 복합 검색 실패 ({response.status_code}): {response.text}")
-        return {"error": "Failed to retrieve complex search recipes"}
+        logger.warning("❌ 복합 검색 실패", extra={"fields": {"status": response.status_code, "body": response.text[:500]}})
+        return None
+
+    return response.json()
+
+# 각 레시피 정보(재료, 제목) 번역 (비동기 병렬 처리)
+# fields에 없는 항목은 번역하지 않고 원문을 그대로 사용합니다.
+async def process_recipe(recipe, fields=LIST_TRANSLATABLE_FIELDS, lang="KO"):
+    originals = [ingredient.get("original", "") for ingredient in recipe.get("extendedIngredients", [])]
+    if "ingredients" in fields:
+        ingredient_tasks = [translate_with_deepl_async(original, target_lang=lang) for original in originals]
+        recipe["ingredients"] = await asyncio.gather(*ingredient_tasks)
+    else:
+        recipe["ingredients"] = originals
 
-    recipes = response.json().get("results", [])
+    if "title" in recipe:
+        recipe["title_kr"] = await translate_with_deepl_async(recipe["title"], target_lang=lang) if "title" in fields else None
 
-    # 각 레시피 정보(재료, 제목) 번역 (비동기 병렬 처리)
-    async def process_recipe(recipe):
-         if "extendedIngredients" in recipe:
-            ingredient_tasks = [
-                translate_with_deepl_async(ingredient.get("original", ""), target_lang="KO")
-                for ingredient in recipe["extendedIngredients"]
-            ]
-            recipe["ingredients"] = await asyncio.gather(*ingredient_tasks)
-         else:
-             recipe["ingredients"] = []
+    return recipe
 
-         if "title" in recipe:
-             recipe["title_kr"] = await translate_with_deepl_async(recipe["title"], target_lang="KO")
+# ✅ 비동기 레시피 추천 함수 (복합 조건)
+async def get_recipes_complex_async(ingredients, allergies=None, cuisine=None, diet=None, translated_terms=None,
+                                    fields=LIST_TRANSLATABLE_FIELDS, lang="KO"):
+    # 이미 번역된 검색어(translated_terms)가 있으면 다시 번역하지 않음
+    if translated_terms is None:
+        translated_terms = await translate_search_terms(ingredients, allergies)
+    translated_ingredients, translated_allergies = translated_terms
+
+    data = await search_recipes_complex_async(translated_ingredients, translated_allergies, cuisine, diet)
+    if data is None:
+        return {"error": "Failed to retrieve complex search recipes"}
 
-         return recipe
+    recipes = data.get("results", [])
 
     # 레시피 목록 전체를 비동기 병렬 처리
-    processed_recipes_tasks = [process_recipe(recipe) for recipe in recipes]
+    processed_recipes_tasks = [process_recipe(recipe, fields, lang) for recipe in recipes]
     processed_recipes = await asyncio.gather(*processed_recipes_tasks)
 
     return processed_recipes
 
-# ✅ 비동기 퍼센트 기반 레시피 검색 함수
-async def get_recipes_by_ingredients_async(ingredients):
-    translated_ingredients_tasks = [translate_with_deepl_async(ingredient, target_lang="EN") for ingredient in ingredients]
-    translated_ingredients = await asyncio.gather(*translated_ingredients_tasks)
-
-    params = {
-        "ingredients": ",".join(translated_ingredients),
-        "number": 100, # 더 많은 결과를 가져와 필터링
-        "apiKey": SPOONACULAR_API_KEY
-    }
-
-    # --- Spoonacular API 호출 전 로깅 ---
-    print("\n--- Spoonacular API 요청 (Find By Ingredients) ---")
-    print(f"URL: {SPOONACULAR_RECIPE_URL}")
-    print(f"Params: {params}")
-    print("-----------------------------------------------\n")
-    # ------------------------------------
+# ✅ 레시피 상세 정보 캐시 (레시피 id 단위)
+# 레시피 내용은 거의 바뀌지 않으므로 soft TTL 이후에는 백그라운드에서만 갱신합니다.
+# - recipe_info_cache: Spoonacular 원본 응답 (지연 번역 API에서도 사용)
+# - recipe_detail_cache: 번역까지 끝난 응답 (레시피 id, 언어, 번역 필드 단위)
+RECIPE_DETAIL_SOFT_TTL = float(os.getenv("RECIPE_DETAIL_SOFT_TTL", str(60 * 60 * 6)))       # 6시간
+RECIPE_DETAIL_HARD_TTL = float(os.getenv("RECIPE_DETAIL_HARD_TTL", str(60 * 60 * 24 * 7)))  # 7일
+RECIPE_DETAIL_MAX_ENTRIES = int(os.getenv("RECIPE_DETAIL_MAX_ENTRIES", "2000"))
+
+recipe_info_cache = StaleWhileRevalidateCache(
+    "recipe_info",
+    soft_ttl=RECIPE_DETAIL_SOFT_TTL,
+    hard_ttl=RECIPE_DETAIL_HARD_TTL,
+    maxsize=RECIPE_DETAIL_MAX_ENTRIES,
+    should_cache=lambda data: "error" not in data,  # 실패 응답은 캐시하지 않음
+)
 
-    async with httpx.AsyncClient() as client:
-         response = await client.get(SPOONACULAR_RECIPE_URL, params=params)
+recipe_detail_cache = StaleWhileRevalidateCache(
+    "recipe_detail",
+    soft_ttl=RECIPE_DETAIL_SOFT_TTL,
+    hard_ttl=RECIPE_DETAIL_HARD_TTL,
+    maxsize=RECIPE_DETAIL_MAX_ENTRIES,
+    should_cache=lambda detail: "error" not in detail and not detail.get("partial"),
+)
 
-    if response.status_code == 200:
-        return response.json()
-    else:
-        raise HTTPException(status_code=response.status_code, detail="❌ 레시피 정보를 가져오는데 실패했습니다.")
+# ✅ 비동기 레시피 원본 정보 함수 (번역 전)
+async def get_recipe_info_async(id: int):
+    return await recipe_info_cache.get_or_load(id, lambda: fetch_recipe_info_async(id))
 
-# ✅ 비동기 레시피 상세 정보 함수
-async def get_recipe_detail_async(id: int):
+async def fetch_recipe_info_async(id: int):
     # 레시피 상세 정보 요청 (비동기)
     url = RECIPE_INFO_URL.format(id=id)
-    params = {"apiKey": SPOONACULAR_API_KEY}
-
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, params=params)
+    try:
+        response = await spoonacular_get(url, {})
+    except DeadlineExceeded:
+        logger.warning("⏱ 상세 정보 가져오기 시간 초과", extra={"fields": {"recipe_id": id}})
+        raise
+    except UpstreamUnavailable as e:
+        logger.warning("⚡ 상세 정보 가져오기 건너뜀", extra={"fields": {"recipe_id": id, "error": str(e)}})
+        raise
 
     if response.status_code != 200:
-        print(f"❌ 상세 정보 가져오기 실패 ({response.status_code}): {response.text}")
+        logger.warning("❌ 상세 정보 가져오기 실패", extra={"fields": {"recipe_id": id, "status": response.status_code, "body": response.text[:500]}})
         return {"error": "Failed to fetch recipe info"}
 
-    data = response.json()
+    return response.json()
 
-    # 번역 처리 (비동기 병렬 처리)
-    translation_tasks = [
-        translate_with_deepl_async(data.get("title", ""), target_lang="KO"),
-        translate_with_deepl_async(data.get("summary", ""), target_lang="KO"),
-        translate_with_deepl_async(data.get("instructions", ""), target_lang="KO")
-    ]
-    ingredients = [ing.get("original", "") for ing in data.get("extendedIngredients", []) if ing.get("original")] # 빈 재료명 제외
-    ingredient_tasks = [translate_with_deepl_async(i, target_lang="KO") for i in ingredients]
+def recipe_ingredient_lines(data):
+    return [ing.get("original", "") for ing in data.get("extendedIngredients", []) if ing.get("original")] # 빈 재료명 제외
+
+# ✅ 비동기 레시피 상세 정보 함수
+async def get_recipe_detail_async(id: int, fields=DETAIL_TRANSLATABLE_FIELDS, lang="KO"):
+    key = (id, lang.upper(), tuple(fields))
+    detail = await recipe_detail_cache.get_or_load(key, lambda: fetch_recipe_detail_async(id, fields, lang))
+    return dict(detail)  # 캐시된 객체가 호출자에 의해 변경되지 않도록 복사본 반환
 
-    results = await asyncio.gather(*(translation_tasks + ingredient_tasks))
+async def fetch_recipe_detail_async(id: int, fields=DETAIL_TRANSLATABLE_FIELDS, lang="KO"):
+    data = await get_recipe_info_async(id)
+    if "error" in data:
+        return data
 
-    translated_title = results[0]
-    translated_summary = results[1]
-    translated_instructions = results[2]
-    translated_ingredients = results[3:]
+    # 선택된 필드만 번역 (비동기 병렬 처리). 번역하지 않는 필드는 원문 유지
+    with budget_scope() as scope:
+        translated = await translate_recipe_fields(data, fields, lang)
 
-    return {
+    detail = {
         "title": data.get("title"), # 원본 제목도 함께 반환 (필요시)
-        "title_kr": translated_title,
-        "summary": translated_summary,
-        "instructions": translated_instructions,
-        "ingredients": translated_ingredients,
+        "title_kr": translated.get("title"),
+        "summary": translated.get("summary", data.get("summary")),
+        "instructions": translated.get("instructions", data.get("instructions")),
+        "ingredients": translated.get("ingredients", recipe_ingredient_lines(data)),
         "image": data.get("image"),
         "readyInMinutes": data.get("readyInMinutes", 0),
         "servings": data.get("servings", 0),
+        "translated_fields": list(fields),
     }
+    if scope.partial:
+        detail["partial"] = True  # 예산 안에 번역하지 못한 필드는 원문
+    return detail
+
+async def translate_recipe_fields(data, fields, lang="KO"):
+    # 원본 레시피(data)에서 fields에 해당하는 값만 번역하여 {필드: 번역 결과}로 반환
+    async def translate_field(field):
+        if field == "ingredients":
+            lines = recipe_ingredient_lines(data)
+            return field, list(await asyncio.gather(*(translate_with_deepl_async(i, target_lang=lang) for i in lines)))
+        if field in HTML_SEGMENTED_FIELDS:
+            return field, await translate_html_async(data.get(field) or "", target_lang=lang)
+        return field, await translate_with_deepl_async(data.get(field) or "", target_lang=lang)
+
+    return dict(await asyncio.gather(*(translate_field(field) for field in fields)))
+
+# ✅ 대체 재료 그래프 (영어 재료명 → Spoonacular 대체 재료 문장 목록)
+# 인메모리 LRU → DB 테이블 2단계로 저장하며 TTL 동안은 Spoonacular를 다시 호출하지 않습니다.
+# 대체 재료의 대체 재료(2단계)는 그래프에 이미 있는 간선만으로 답합니다.
+SUBSTITUTES_TTL = float(os.getenv("SUBSTITUTES_TTL", str(60 * 60 * 24 * 30)))        # 그래프 간선 유지 시간 (초)
+SUBSTITUTES_MEMORY_MAX_ENTRIES = int(os.getenv("SUBSTITUTES_MEMORY_MAX_ENTRIES", "5000"))
+SUBSTITUTES_BATCH_MAX = int(os.getenv("SUBSTITUTES_BATCH_MAX", "20"))               # 배치 요청당 최대 재료 수
+SUBSTITUTE_UNITS = frozenset({
+    "cup", "cups", "tablespoon", "tablespoons", "tbsp", "teaspoon", "teaspoons", "tsp", "oz", "ounce", "ounces",
+    "pound", "pounds", "lb", "lbs", "g", "gram", "grams", "kg", "ml", "l", "liter", "liters", "pinch", "dash",
+    "clove", "cloves", "slice", "slices", "can", "cans", "stick", "sticks", "package", "packages", "part", "parts",
+})
+
+def substitute_ingredient_name(line):
+    # "1 cup = 1 cup soy milk" → "soy milk". 여러 재료를 섞는 대체("... + ...")는 그래프 간선으로 쓰지 않음
+    text = line.split("=")[-1]
+    if "+" in text:
+        return None
+    text = re.sub(r"\([^)]*\)", " ", text).lower()
+    words = text.split()
+    while words and (words[0] in SUBSTITUTE_UNITS or re.fullmatch(r"[\d/.,½¼¾⅓⅔-]+", words[0])):
+        words.pop(0)
+    name = normalize_ingredient_name(" ".join(words))
+    return name or None
+
+class SubstituteGraph:
+    def __init__(self, maxsize=SUBSTITUTES_MEMORY_MAX_ENTRIES, ttl=SUBSTITUTES_TTL):
+        self.memory = TTLCache(maxsize, ttl)  # 정규화된 재료명 -> 대체 재료 문장 목록
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, name):
+        # 그래프에 있는 간선만 조회 (Spoonacular 호출 없음). 없으면 None
+        substitutes = self.memory.get(name)
+        if substitutes is None:
+            substitutes = await self._load(name)
+            if substitutes is not None:
+                self.memory.set(name, substitutes)
+        return substitutes
+
+    async def get_or_fetch(self, name):
+        substitutes = await self.get(name)
+        if substitutes is not None:
+            self.hits += 1
+            return substitutes
+        self.misses += 1
+
+        async def fetch_and_store():
+            substitutes = await fetch_substitutes_async(name)
+            if substitutes is not None:  # 호출 실패는 저장하지 않음 (빈 목록은 저장)
+                self.memory.set(name, substitutes)
+                await self._store(name, substitutes)
+            return substitutes or []
+
+        return await single_flight.do(("substitutes", name), fetch_and_store)
+
+    async def two_hop(self, name, direct):
+        # direct: name의 대체 재료 문장 목록. 각 대체 재료의 대체 재료를 그래프에서만 찾음
+        seen = {name}
+        vias = []
+        for line in direct:
+            via = substitute_ingredient_name(line)
+            if via and via not in seen:
+                seen.add(via)
+                vias.append(via)
+        results = await asyncio.gather(*(self.get(via) for via in vias))
+        hops = []
+        for via, lines in zip(vias, results):
+            lines = [line for line in lines or [] if substitute_ingredient_name(line) not in seen]
+            if lines:
+                hops.append({"via": via, "substitutes": lines})
+        return hops
+
+    async def _load(self, name):
+        try:
+            async with resources.session() as db:
+                entry = await db.get(IngredientSubstitutesEntry, name)
+        except Exception as e:
+            logger.warning("❌ 대체 재료 그래프 조회 실패", extra={"fields": {"error": str(e)}})
+            return None
+        if entry is None or entry.fetched_at < time.time() - self.ttl:
+            return None
+        return json.loads(entry.substitutes)
+
+    async def _store(self, name, substitutes):
+        try:
+            async with resources.session() as db:
+                await db.merge(IngredientSubstitutesEntry(
+                    ingredient=name,
+                    substitutes=json.dumps(substitutes, ensure_ascii=False),
+                    fetched_at=time.time()
+                ))
+                await db.commit()
+        except Exception as e:
+            logger.warning("❌ 대체 재료 그래프 저장 실패", extra={"fields": {"error": str(e)}})
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+substitute_graph = SubstituteGraph()
+
+async def fetch_substitutes_async(english_name):
+    # Spoonacular 대체 재료 조회. 실패 시 None, 서킷이 열려 있으면 UpstreamUnavailable
+    params = {"ingredientName": english_name}
+
+    # --- Spoonacular API 호출 전 로깅 (API 키 제외) ---
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Spoonacular API 요청 (Substitutes)", extra={"fields": {"url": SUBSTITUTE_URL, "params": params}})
+
+    try:
+        response = await spoonacular_get(SUBSTITUTE_URL, params)
+    except DeadlineExceeded:
+        mark_partial()
+        return None
+
+    if response.status_code != 200:
+        logger.warning("❌ 대체 재료 가져오기 실패", extra={"fields": {"status": response.status_code, "body": response.text[:500]}})
+        return None
+    return response.json().get("substitutes") or []  # 대체 재료가 없으면 status "failure"와 함께 목록 없음
+
+async def resolve_substitutes_async(ingredient_name, lang="KO", two_hop=False):
+    # 한국어 재료명 → 영어로 번역 → 그래프 조회(없으면 Spoonacular) → 대체 재료를 lang으로 번역
+    # 재료명을 번역하지 못하면 한국어 이름으로 조회/저장하지 않도록 실패시킴
+    translated_ingredient = await translate_with_deepl_async(ingredient_name, target_lang="EN", strict=True)
+    name = normalize_ingredient_name(translated_ingredient)
+    result = {"ingredient": ingredient_name, "ingredient_en": translated_ingredient, "substitutes": []}
+    if not name:
+        return result
+    if HANGUL_PATTERN.search(name):
+        # 번역 결과가 여전히 한국어면 Spoonacular에서 찾을 수 없으므로 조회하지 않고, 빈 결과를 그래프에 저장하지도 않음
+        mark_partial()
+        return result
+
+    direct = await substitute_graph.get_or_fetch(name)
+    hops = await substitute_graph.two_hop(name, direct) if two_hop else []
+
+    async def translate_lines(lines):
+        return list(await asyncio.gather(*(translate_with_deepl_async(line, target_lang=lang) for line in lines)))
+
+    result["substitutes"] = await translate_lines(direct)
+    if two_hop:
+        translated_hops = await asyncio.gather(*(translate_lines(hop["substitutes"]) for hop in hops))
+        result["two_hop"] = [
+            {"via": hop["via"], "substitutes": lines} for hop, lines in zip(hops, translated_hops)
+        ]
+    return result
 
-# ✅ 비동기 대체 재료 API
 async def get_substitutes_async(ingredient_name):
     if not ingredient_name:
         return []
+    return (await resolve_substitutes_async(ingredient_name))["substitutes"]
 
-    # 이 부분이 한국어 재료명을 영어로 번역하는 부분입니다.
-    translated_ingredient = await translate_with_deepl_async(ingredient_name, target_lang="EN")
+async def get_db():
+    async with resources.session() as db:
+        yield db
 
-    params = {
-        "ingredientName": translated_ingredient, # <-- 번역된 영어 재료명을 Spoonacular에 전달합니다.
-        "apiKey": SPOONACULAR_API_KEY
+# ✅ 사용자 + 선호도 인메모리 캐시 (user_id 단위)
+# 선호도/사용자 정보를 쓰는 곳에서는 반드시 invalidate_user_profile을 호출합니다.
+# 캐시는 워커마다 따로 있고 invalidate는 현재 워커에만 적용되므로, 다른 워커가 바뀐 알레르기/식단을
+# 늦게 보는 시간을 줄이도록 TTL을 몇 초로 짧게 둡니다. (같은 화면에서 이어지는 조회만 합침)
+USER_PROFILE_CACHE_TTL = float(os.getenv("USER_PROFILE_CACHE_TTL", "5"))
+# 사용자/선호도가 아직 없는 결과는 다른 워커에서 곧 생길 수 있으므로 아주 짧게만 캐시
+USER_PROFILE_NEGATIVE_CACHE_TTL = float(os.getenv("USER_PROFILE_NEGATIVE_CACHE_TTL", "2"))
+USER_PROFILE_CACHE_MAX_ENTRIES = int(os.getenv("USER_PROFILE_CACHE_MAX_ENTRIES", "10000"))
+
+user_profile_cache = TTLCache(USER_PROFILE_CACHE_MAX_ENTRIES, USER_PROFILE_CACHE_TTL)
+
+async def get_user_profile(db, user_id):
+    # {"user": {...} | None, "preferences": {...} | None}
+    profile = user_profile_cache.get(user_id)
+    if profile is not None:
+        return profile
+
+    # 사용자와 선호도를 한 번의 쿼리로 조회 (둘 중 하나만 있어도 조회되도록 user_id 기준 LEFT JOIN)
+    key = select(literal(user_id).label("user_id")).subquery()
+    row = (await db.execute(
+        select(User, UserPreferences)
+        .select_from(key)
+        .outerjoin(User, User.id == key.c.user_id)
+        .outerjoin(UserPreferences, UserPreferences.user_id == key.c.user_id)
+    )).first()
+    user, pref = row if row is not None else (None, None)
+
+    profile = {
+        "user": {"id": user.id, "email": user.email, "name": user.name} if user else None,
+        "preferences": {"diet": pref.diet, "allergies": pref.allergies} if pref else None,
     }
+    complete = profile["user"] is not None and profile["preferences"] is not None
+    user_profile_cache.set(user_id, profile, ttl=None if complete else USER_PROFILE_NEGATIVE_CACHE_TTL)
+    return profile
 
-    # --- Spoonacular API 호출 전 로깅 ---
-    print("\n--- Spoonacular API 요청 (Substitutes) ---")
-    print(f"URL: {SUBSTITUTE_URL}")
-    print(f"Params: {params}")
-    print("---------------------------------------\n")
-    # ------------------------------------
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(SUBSTITUTE_URL, params=params)
-
-    if response.status_code == 200:
-        substitutes = response.json().get("substitutes", [])
-        # Spoonacular에서 받은 영어 대체 재료 목록을 다시 한국어로 번역합니다.
-        translated_substitutes_tasks = [translate_with_deepl_async(s, target_lang="KO") for s in substitutes]
-        translated_substitutes = await asyncio.gather(*translated_substitutes_tasks)
-        return translated_substitutes
-    else:
-        print(f"❌ 대체 재료 가져오기 실패 ({response.status_code}): {response.text}")
-        return []
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def invalidate_user_profile(user_id):
+    user_profile_cache.pop(user_id)
 
 @app.get("/api/preferences/{user_id}")
-def read_preferences(user_id: str, db: Session = Depends(get_db)):
-    pref = db.query(UserPreferences).filter_by(user_id=user_id).first()
+async def read_preferences(user_id: str, db: AsyncSession = Depends(get_db)):
+    pref = (await get_user_profile(db, user_id))["preferences"]
     if not pref:
         raise HTTPException(status_code=404, detail="Preferences not set")
-    return {"diet": pref.diet, "allergies": pref.allergies}
+    return dict(pref)
 
 @app.post("/api/preferences/{user_id}")
-def create_preferences(
+async def create_preferences(
     user_id: str,
     payload: dict,  # {"diet": "{...}", "allergies": "a,b,c"}
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # 이미 저장되어 있으면 거부
-    exists = db.query(UserPreferences).filter_by(user_id=user_id).first()
-    if exists:
+    if (await get_user_profile(db, user_id))["preferences"]:
         raise HTTPException(status_code=400, detail="Preferences already set")
 
-    pref = UserPreferences(
+    db.add(UserPreferences(
         user_id=user_id,
         diet=payload.get("diet"),
         allergies=payload.get("allergies")
-    )
-    db.add(pref)
-    db.commit()
-    db.refresh(pref)
+    ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        # 어떤 제약이 실패했는지 DB 상태로 확인 (드라이버마다 오류 메시지가 다름)
+        invalidate_user_profile(user_id)
+        profile = await get_user_profile(db, user_id)
+        if profile["preferences"]:
+            # 동시에 들어온 다른 요청이 먼저 저장한 경우 (user_id unique)
+            raise HTTPException(status_code=400, detail="Preferences already set")
+        if profile["user"] is None:
+            # 없는 사용자 (users.id 외래 키)
+            raise HTTPException(status_code=404, detail="User not found")
+        raise
+    finally:
+        invalidate_user_profile(user_id)
     return {"message": "Preferences saved"}
 
-# Substitute 검색 함수
-def get_substitutes(ingredient_name):
-    params = {
-        "ingredientName": ingredient_name,
-        "apiKey": SPOONACULAR_API_KEY
-    }
-    response = requests.get(SUBSTITUTE_URL, params=params)
-
-    if response.status_code == 200:
-        return response.json().get("substitutes", [])
-    else:
-        return {"error": "Failed to retrieve substitutes"}
-
 # ✅ 요청 모델 정의 (프론트엔드에 맞춤)
 class IngredientsRequest(BaseModel):
     ingredients: List[str]
@@ -353,112 +2154,453 @@ class IngredientsRequest(BaseModel):
             raise ValueError("❌ 최소 1개 이상의 재료를 입력해야 합니다.")
         return v
 
-# ✅ 레시피 추천 API (복합 조건)
-@app.post("/get_recipes/")
-async def get_recipes(request: IngredientsRequest):
-    print("📥 받은 요청 데이터:", {
-        "ingredients": request.ingredients,
-        "allergies": request.allergies,
-        "cuisine": request.cuisine,
-        "dietary": request.dietary
-    })
+# ✅ 스트리밍 응답 (NDJSON 또는 SSE)
+# frames: dict를 순서대로 내보내는 async generator. 각 dict의 "type"이 SSE 이벤트 이름이 됩니다.
+def streaming_frames_response(frames, stream_format="ndjson"):
+    sse = stream_format == "sse"
 
-    # 알레르기 문자열 → 리스트
-    allergies_list = [a.strip() for a in request.allergies.split(",")] if request.allergies else []
+    async def body():
+        async for frame in frames:
+            data = json.dumps(frame, ensure_ascii=False)
+            if sse:
+                yield f"event: {frame.get('type', 'message')}\ndata: {data}\n\n"
+            else:
+                yield data + "\n"
 
-    recipes = await get_recipes_complex_async( # await 추가
-        ingredients=request.ingredients,
-        allergies=request.allergies, # 문자열 그대로 전달 (get_recipes_complex_async 내부에서 처리)
-        cuisine=request.cuisine,
-        diet=request.dietary
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache"}
     )
 
-    # Spoonacular API 요청 파라미터 로깅 (번역된 재료 사용)
-    # 이미 get_recipes_complex_async에서 번역을 수행했으므로, 거기서 로깅하거나
-    # 번역된 결과를 받아서 로깅하는 것이 더 정확합니다. 여기서는 생략합니다.
+async def stream_recipes_complex(request: IngredientsRequest, fields=LIST_TRANSLATABLE_FIELDS, lang="KO",
+                                 response_fields=RECIPE_SUMMARY_FIELDS):
+    # 1) 번역 전 Spoonacular 결과를 먼저 보내고, 2) 레시피별 번역이 끝나는 대로 한국어 필드를 보냅니다.
+    # 검색은 응답을 시작하기 전에 끝내야 실패(504/503)를 상태 코드로 돌려줄 수 있음
+    translated_terms = await translate_search_terms(request.ingredients, request.allergies)
+    data = await search_recipes_complex_async(*translated_terms, request.cuisine, request.dietary)
+    return recipe_frames(data, fields, lang, response_fields)
 
+async def recipe_frames(data, fields, lang, response_fields):
+    if data is None:
+        yield {"type": "error", "error": "Failed to retrieve complex search recipes"}
+        return
 
-    # 제목 번역은 get_recipes_complex_async 내부에서 처리됨
-    return recipes
+    recipes = data.get("results", [])
+    yield {"type": "recipes", "recipes": [compact_recipe(recipe, response_fields) for recipe in recipes]}
 
-# ✅ 퍼센트 기반 레시피 추천 API 비동기화
-@app.post("/get_recipes_by_percent/")
-async def get_recipes_by_percent(request: IngredientsRequest):
-    # 1. 사용자 입력 재료를 영어로 번역
-    translated_ingredients_tasks = [translate_with_deepl_async(i, target_lang="EN") for i in request.ingredients]
-    translated_ingredients = await asyncio.gather(*translated_ingredients_tasks)
-    user_ingredients_en = set([i.strip().lower() for i in translated_ingredients if i.strip()]) # 빈 문자열 제거 및 소문자/집합화
-
-    print(f"[DEBUG] 사용자 입력 재료 (번역 후): {user_ingredients_en}")
+    async def translate(index, recipe):
+        await process_recipe(recipe, fields, lang)
+        return index, recipe
 
-    # 2. 일반 레시피 추천 결과 가져오기 (영어 extendedIngredients 포함)
-    recipes = await get_recipes_complex_async(
-        ingredients=request.ingredients,
-        allergies=request.allergies,
-        cuisine=request.cuisine,
-        diet=request.dietary
+    tasks = [asyncio.create_task(translate(i, recipe)) for i, recipe in enumerate(recipes)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, recipe = await next_done
+            yield {
+                "type": "recipe",
+                "index": index,
+                "id": recipe.get("id"),
+                "title_kr": recipe.get("title_kr"),
+                "ingredients": recipe.get("ingredients", []),
+            }
+    finally:
+        for task in tasks:
+            task.cancel()  # 클라이언트가 연결을 끊으면 남은 번역 중단
+
+    yield {"type": "done"}
+
+# ✅ /get_recipes/ 결과 캐시 (정규화된 검색 조건 단위)
+# ["계란","양파"]와 ["양파", "계란 "]처럼 같은 조건은 같은 키가 되어 번역/검색 파이프라인을 한 번만 탑니다.
+RECIPE_QUERY_CACHE_TTL = float(os.getenv("RECIPE_QUERY_CACHE_TTL", "600"))
+RECIPE_QUERY_CACHE_MAX_ENTRIES = int(os.getenv("RECIPE_QUERY_CACHE_MAX_ENTRIES", "2000"))
+
+def normalize_query_term(value):
+    return unicodedata.normalize("NFC", value or "").strip().casefold()
+
+def canonical_recipe_query(ingredients, allergies, cuisine, diet, fields, lang):
+    return (
+        tuple(sorted({term for term in map(normalize_query_term, ingredients) if term})),
+        tuple(sorted({term for term in map(normalize_query_term, (allergies or "").split(",")) if term})),
+        normalize_query_term(cuisine) or None,
+        normalize_query_term(diet) or None,
+        tuple(fields),
+        lang.upper(),
     )
 
-    categorized_recipes = {
-        "100%": [],
-        "80%": [],
-        "50%": [],
-        "30%": [],
-        "<30%": []
-    }
+PARTIAL_HEADER = "X-Partial-Result"  # 예산 초과로 일부 필드가 번역되지 않은 응답 표시 (목록 응답용)
+
+def make_etag(payload):
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode()
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+class RecipeQueryCache:
+    def __init__(self, maxsize=RECIPE_QUERY_CACHE_MAX_ENTRIES, ttl=RECIPE_QUERY_CACHE_TTL):
+        self.entries = TTLCache(maxsize, ttl)  # key -> (recipes, etag, partial)
+        self.fallback = TTLCache(maxsize, ttl + STALE_IF_ERROR_SECONDS)  # 검색 실패 시 대신 돌려줄 지난 결과
+        self.hits = 0
+        self.stale_if_error_hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, key, load):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+
+        async def load_and_store():
+            try:
+                with budget_scope() as scope:
+                    recipes = await load()
+            except (DeadlineExceeded, UpstreamUnavailable):
+                stale = self.fallback.get(key)
+                if stale is None:
+                    raise
+                self.stale_if_error_hits += 1
+                return stale
+            entry = (recipes, make_etag(recipes), scope.partial)
+            # 실패 결과와 예산 초과로 일부만 번역된 결과는 캐시하지 않음
+            if not scope.partial and not (isinstance(recipes, dict) and "error" in recipes):
+                self.entries.set(key, entry)
+                self.fallback.set(key, entry)
+                return entry
+            stale = self.fallback.get(key)
+            if stale is not None:
+                self.stale_if_error_hits += 1
+                return stale  # 업스트림 실패(서킷 열림 등) 시 지난 결과로 응답
+            return entry
+
+        return await single_flight.do(("get_recipes", key), load_and_store)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "stale_if_error_hits": self.stale_if_error_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+recipe_query_cache = RecipeQueryCache()
+
+# ✅ 레시피 추천 API (복합 조건)
+@app.post("/get_recipes/")
+async def get_recipes(
+    request: IngredientsRequest,
+    stream: bool = Query(False),                                   # true면 결과를 스트리밍
+    stream_format: str = Query("ndjson", pattern="^(ndjson|sse)$"), # 스트리밍 형식
+    translate: Optional[str] = Query(None),                         # 번역할 필드 (title,ingredients / none)
+    lang: str = Query("KO", pattern=LANG_PATTERN),                  # 번역 대상 언어
+    fields: Optional[str] = Query(None),                            # 응답에 포함할 필드 (id,title_kr,image ...)
+    if_none_match: Optional[str] = Header(None)                     # 재검증용 ETag
+):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("📥 받은 요청 데이터", extra={"fields": {
+            "ingredients": request.ingredients,
+            "allergies": request.allergies,
+            "cuisine": request.cuisine,
+            "dietary": request.dietary
+        }})
+
+    translate_fields = parse_translate_fields(translate, LIST_TRANSLATABLE_FIELDS)
+    response_fields = parse_response_fields(fields)
+
+    if stream:
+        return streaming_frames_response(
+            await stream_recipes_complex(request, translate_fields, lang, response_fields), stream_format
+        )
 
-    for recipe in recipes:
-        # 레시피의 사용된 재료(영어)
-        recipe_ingredients_en = set(
-            [ing.get("name", "").strip().lower() for ing in recipe.get("extendedIngredients", []) if ing.get("name")]
+    query = canonical_recipe_query(
+        request.ingredients, request.allergies, request.cuisine, request.dietary, translate_fields, lang
+    )
+    ingredients, allergies, cuisine, diet, _, _ = query
+
+    async def load():
+        # 정규화된 조건으로 검색해야 캐시된 결과와 실제 결과가 항상 같음
+        recipes = await get_recipes_complex_async(
+            ingredients=list(ingredients),
+            allergies=",".join(allergies),
+            cuisine=cuisine,
+            diet=diet,
+            fields=translate_fields,
+            lang=lang
         )
-        print(f"[DEBUG] 레시피 ID: {recipe.get('id')}, 레시피 제목: {recipe.get('title')}, 추출된 재료: {recipe_ingredients_en}")
-
-        if not recipe_ingredients_en or not user_ingredients_en:
-            print(f"[DEBUG] 매칭 불가: 레시피 재료 또는 사용자 재료 없음 (ID: {recipe.get('id')})")
-            continue
-
-        matched_count = 0
-        matched_ingredients_list = [] # 매칭된 재료 확인용 리스트
-        for user_ing in user_ingredients_en:
-            is_matched_for_user_ing = False
-            for recipe_ing in recipe_ingredients_en:
-                # 단어 안에 포함만 되어도 매칭으로 인식
-                if user_ing in recipe_ing or recipe_ing in user_ing:
-                    is_matched_for_user_ing = True
-                    matched_ingredients_list.append(user_ing) # 매칭된 재료 추가
+        if isinstance(recipes, dict):  # 오류 응답
+            return recipes
+        return [compact_recipe(recipe, response_fields) for recipe in recipes]
+
+    with request_budget(REQUEST_BUDGET_SECONDS):
+        recipes, etag, partial = await recipe_query_cache.get_or_load((query, response_fields), load)
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if partial:
+        headers = {PARTIAL_HEADER: "true", "Cache-Control": "no-store"}
+    if etag_matches(if_none_match, etag) and not partial:
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(content=recipes, headers=headers)
+
+# ✅ 재료 매칭 엔진
+# 재료명을 한 번만 정규화(소문자화, 단수화, "chopped" 같은 수식어 제거)하고
+# 사용자 재료로 Aho-Corasick 오토마톤을 만들어 레시피 여러 개를 한 번에 채점합니다.
+INGREDIENT_QUALIFIERS = frozenset({
+    "chopped", "diced", "minced", "sliced", "grated", "shredded", "crushed", "ground",
+    "fresh", "freshly", "frozen", "dried", "canned", "cooked", "raw", "peeled", "boneless",
+    "skinless", "large", "medium", "small", "whole", "finely", "roughly", "thinly", "optional",
+    "of", "and", "or", "to", "taste", "for", "the", "a", "an",
+})
+# 단수화 규칙에서 제외할 단어
+SINGULAR_EXCEPTIONS = frozenset({"molasses", "swiss", "hummus", "asparagus", "couscous", "citrus", "bass", "grass"})
+
+def singularize(word):
+    if len(word) <= 3 or word in SINGULAR_EXCEPTIONS:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"            # berries -> berry
+    if word.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return word[:-2]                  # tomatoes -> tomato, peaches -> peach
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]                  # eggs -> egg
+    return word
+
+@lru_cache(maxsize=20000)
+def normalize_ingredient_name(name):
+    text = unicodedata.normalize("NFKC", name).lower()
+    text = re.sub(r"[^\w\s]|_", " ", text)
+    tokens = [singularize(token) for token in text.split() if token not in INGREDIENT_QUALIFIERS]
+    return " ".join(tokens)
+
+class AhoCorasick:
+    def __init__(self, patterns):
+        # patterns: {패턴 문자열: 값}
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for pattern, value in patterns.items():
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(value)
+
+        # BFS로 실패 링크 구성
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def search(self, text):
+        state = 0
+        found = set()
+        for ch in text:
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            found.update(self._out[state])
+        return found
+
+class IngredientMatcher:
+    def __init__(self, user_ingredients):
+        self.user_terms = sorted({normalize_ingredient_name(i) for i in user_ingredients} - {""})
+        # 양 끝에 공백을 붙여 단어 단위로만 매칭 (egg가 eggplant에 매칭되지 않도록)
+        self._automaton = AhoCorasick({f" {term} ": idx for idx, term in enumerate(self.user_terms)})
+        # 반대 방향(레시피 재료가 사용자 재료에 포함)은 사용자 재료의 연속 단어 구간으로 조회
+        self._spans = {}
+        for idx, term in enumerate(self.user_terms):
+            tokens = term.split()
+            for i in range(len(tokens)):
+                for j in range(i + 1, len(tokens) + 1):
+                    self._spans.setdefault(" ".join(tokens[i:j]), set()).add(idx)
+        self._memo = {}
+
+    def match(self, recipe_ingredient):
+        # 정규화된 레시피 재료 하나에 매칭되는 사용자 재료 인덱스 집합
+        found = self._memo.get(recipe_ingredient)
+        if found is None:
+            found = self._automaton.search(f" {recipe_ingredient} ") | self._spans.get(recipe_ingredient, set())
+            self._memo[recipe_ingredient] = found
+        return found
+
+    def score(self, recipe):
+        recipe_ingredients = {
+            normalize_ingredient_name(ing["name"])
+            for ing in recipe.get("extendedIngredients", []) if ing.get("name")
+        } - {""}
+        if not recipe_ingredients or not self.user_terms:
+            return None  # 매칭 불가
+
+        matched = set()
+        for recipe_ingredient in recipe_ingredients:
+            matched |= self.match(recipe_ingredient)
+        # 추천 레시피의 재료 개수를 분모로 사용
+        match_score = min(1.0, len(matched) / len(recipe_ingredients))
+        return match_score, [self.user_terms[idx] for idx in sorted(matched)]
+
+    def score_batch(self, recipes):
+        # (레시피, 매칭 점수, 매칭된 사용자 재료) 목록. 매칭 불가한 레시피는 제외
+        results = []
+        for recipe in recipes:
+            scored = self.score(recipe)
+            if scored is not None:
+                results.append((recipe, scored[0], scored[1]))
+        return results
+
+MATCH_CATEGORIES = [(1.0, "100%"), (0.8, "80%"), (0.5, "50%"), (0.3, "30%")]
+
+def categorize_match_score(match_score):
+    for threshold, category in MATCH_CATEGORIES:
+        if match_score >= threshold:
+            return category
+    return "<30%"
+
+# 퍼센트 기반 검색의 후보 페이지 설정
+PERCENT_SEARCH_PAGE_SIZE = int(os.getenv("PERCENT_SEARCH_PAGE_SIZE", "20"))
+PERCENT_SEARCH_MAX_PAGES = int(os.getenv("PERCENT_SEARCH_MAX_PAGES", "5"))
+PERCENT_SEARCH_PARALLEL_PAGES = int(os.getenv("PERCENT_SEARCH_PARALLEL_PAGES", "2"))  # 동시에 요청할 페이지 수
+PERCENT_BUCKET_SIZE = 5  # 카테고리별 최대 레시피 수
+
+# ✅ 퍼센트 기반 레시피 추천 API 비동기화
+@app.post("/get_recipes_by_percent/")
+async def get_recipes_by_percent(
+    request: IngredientsRequest,
+    translate: Optional[str] = Query(None),          # 번역할 필드 (title,ingredients / none)
+    lang: str = Query("KO", pattern=LANG_PATTERN),   # 번역 대상 언어
+    fields: Optional[str] = Query(None)              # 응답에 포함할 필드 (id,title_kr,match_percentage ...)
+):
+    translate_fields = parse_translate_fields(translate, LIST_TRANSLATABLE_FIELDS)
+    response_fields = parse_response_fields(fields)
+
+    with request_budget(PERCENT_REQUEST_BUDGET_SECONDS) as budget:
+        # 1. 사용자 입력 재료/알레르기를 영어로 한 번만 번역
+        translated_ingredients, translated_allergies = await translate_search_terms(request.ingredients, request.allergies)
+        matcher = IngredientMatcher(translated_ingredients)
+
+        categorized_recipes = {
+            "100%": [],
+            "80%": [],
+            "50%": [],
+            "30%": [],
+            "<30%": []
+        }
+        seen_ids = set()
+
+        def fetch_page(page):
+            return asyncio.create_task(search_recipes_complex_async(
+                translated_ingredients, translated_allergies, request.cuisine, request.dietary,
+                number=PERCENT_SEARCH_PAGE_SIZE, offset=page * PERCENT_SEARCH_PAGE_SIZE
+            ))
+
+        # 2. 후보 페이지를 offset으로 나눠 동시에 가져오고, 도착하는 대로 채점
+        #    모든 카테고리가 가득 차거나 결과가 더 없으면 조기 종료
+        next_page = 0
+        total_results = None
+        in_flight = set()
+        page_error = None
+        try:
+            while True:
+                while len(in_flight) < PERCENT_SEARCH_PARALLEL_PAGES and next_page < PERCENT_SEARCH_MAX_PAGES and (
+                    total_results is None or next_page * PERCENT_SEARCH_PAGE_SIZE < total_results
+                ):
+                    in_flight.add(fetch_page(next_page))
+                    next_page += 1
+                if not in_flight:
                     break
-            if is_matched_for_user_ing:
-                matched_count += 1
-        matched = matched_count
-
-        total = len(recipe_ingredients_en) # 추천 레시피의 재료 개수를 분모로 사용 (이전 변경 유지)
-        match_score = matched / total if total > 0 else 0
-        
-        print(f"[DEBUG] 레시피 ID: {recipe.get('id')}, 매칭된 재료: {matched_ingredients_list}, 일치 개수: {matched}, 총 레시피 재료 개수: {total}, 매칭 점수: {match_score:.2f}")
-
-        # 카테고리 분류
-        if match_score >= 1.0:
-            category = "100%"
-        elif match_score >= 0.8:
-            category = "80%"
-        elif match_score >= 0.5:
-            category = "50%"
-        elif match_score >= 0.3:
-            category = "30%"
-        else:
-            category = "<30%"
 
-        recipe["match_percentage"] = f"{int(match_score * 100)}%"
-        if len(categorized_recipes[category]) < 5:
-            categorized_recipes[category].append(recipe)
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        data = task.result()
+                    except (DeadlineExceeded, UpstreamUnavailable) as e:
+                        page_error = e
+                        continue
+                    if data is None:
+                        continue
+                    total_results = data.get("totalResults", total_results)
+                    candidates = [r for r in data.get("results", []) if r.get("id") not in seen_ids]
+                    seen_ids.update(r.get("id") for r in candidates)
+
+                    # 3. 페이지 단위로 한 번에 채점하여 카테고리 분류
+                    for recipe, match_score, _ in matcher.score_batch(candidates):
+                        category = categorize_match_score(match_score)
+                        if len(categorized_recipes[category]) < PERCENT_BUCKET_SIZE:
+                            recipe["match_percentage"] = f"{int(match_score * 100)}%"
+                            categorized_recipes[category].append(recipe)
+
+                if page_error is not None:
+                    if not seen_ids:
+                        raise page_error  # 채점할 결과가 하나도 없으면 504/503
+                    mark_partial()  # 이미 채점한 결과만 반환
+                    break
+                if all(len(bucket) >= PERCENT_BUCKET_SIZE for bucket in categorized_recipes.values()):
+                    break
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        # 4. 최종 선택된 레시피만 한국어로 번역
+        await asyncio.gather(*(
+            process_recipe(recipe, translate_fields, lang) for bucket in categorized_recipes.values() for recipe in bucket
+        ))
 
-    return categorized_recipes
+    content = {
+        category: [compact_recipe(recipe, response_fields) for recipe in bucket]
+        for category, bucket in categorized_recipes.items()
+    }
+    return FastJSONResponse(content=content, headers={PARTIAL_HEADER: "true"} if budget.partial else None)
 
 # ✅ 레시피 상세 정보 API 비동기화
 @app.get("/get_recipe_detail/")
-async def get_recipe_detail_endpoint(id: int = Query(...)): # 쿼리 파라미터로 id 받기
-    return await get_recipe_detail_async(id) # await 추가
+async def get_recipe_detail_endpoint(
+    id: int = Query(...),                           # 쿼리 파라미터로 id 받기
+    translate: Optional[str] = Query(None),         # 번역할 필드 (title,summary,instructions,ingredients / none)
+    lang: str = Query("KO", pattern=LANG_PATTERN)   # 번역 대상 언어
+):
+    fields = parse_translate_fields(translate, DETAIL_TRANSLATABLE_FIELDS)
+    with request_budget(REQUEST_BUDGET_SECONDS):
+        return await get_recipe_detail_async(id, fields, lang) # await 추가
+
+# ✅ 필드 지연 번역 API
+# 목록/상세 화면에서 번역하지 않은 필드를 사용자가 펼칠 때 해당 필드만 번역합니다.
+class TranslateFieldsRequest(BaseModel):
+    recipe_id: int
+    fields: List[str]
+    lang: str = "KO"
+
+@app.post("/translate_fields/")
+async def translate_fields_endpoint(request: TranslateFieldsRequest):
+    fields = parse_translate_fields(",".join(request.fields), DETAIL_TRANSLATABLE_FIELDS)
+    if not re.match(LANG_PATTERN, request.lang):
+        raise HTTPException(status_code=400, detail="잘못된 lang 값입니다.")
+
+    with request_budget(REQUEST_BUDGET_SECONDS) as budget:
+        data = await get_recipe_info_async(request.recipe_id)
+        if "error" in data:
+            return data
+        translated = await translate_recipe_fields(data, fields, request.lang)
+
+    result = {"id": request.recipe_id, "lang": request.lang.upper(), **translated}
+    if budget.partial:
+        result["partial"] = True
+    return result
 
 # ✅ 대체 재료 API 비동기화
 @app.post("/get_substitutes/")
@@ -466,69 +2608,302 @@ async def get_substitute_endpoint(request: IngredientsRequest):
     if not request.ingredients:
         return {"substitutes": [], "error": "No ingredient provided"}
 
-    substitutes = await get_substitutes_async(request.ingredients[0]) # await 추가
+    with request_budget(REQUEST_BUDGET_SECONDS) as budget:
+        substitutes = await get_substitutes_async(request.ingredients[0]) # await 추가
 
+    if budget.partial:
+        return {"substitutes": substitutes, "partial": True}
     return {"substitutes": substitutes}
 
-@app.on_event("startup")
-def on_startup():
-    Base.metadata.create_all(bind=engine)
+# ✅ 여러 재료의 대체 재료를 한 번에 조회 (재료별 병렬 처리)
+@app.post("/get_substitutes_batch/")
+async def get_substitutes_batch(
+    request: IngredientsRequest,
+    two_hop: bool = Query(False),                   # true면 대체 재료의 대체 재료도 그래프에서 함께 반환
+    lang: str = Query("KO", pattern=LANG_PATTERN)   # 대체 재료 번역 대상 언어
+):
+    ingredients = list(dict.fromkeys(i.strip() for i in request.ingredients if i.strip()))
+    if len(ingredients) > SUBSTITUTES_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"❌ 재료는 최대 {SUBSTITUTES_BATCH_MAX}개까지 요청할 수 있습니다.")
+
+    async def resolve(ingredient):
+        try:
+            return await resolve_substitutes_async(ingredient, lang, two_hop)
+        except (DeadlineExceeded, UpstreamUnavailable) as e:
+            # 한 재료의 실패가 전체 응답을 막지 않도록 빈 결과로 두고 partial 표시
+            mark_partial()
+            return e
+
+    with request_budget(BATCH_REQUEST_BUDGET_SECONDS) as budget, request_priority(PRIORITY_BATCH):
+        results = await asyncio.gather(*(resolve(i) for i in ingredients))
+
+    failed = [result for result in results if isinstance(result, Exception)]
+    if failed and len(failed) == len(results):
+        raise failed[0]  # 모든 재료가 실패하면 504/503
+    results = [
+        {"ingredient": ingredient, "ingredient_en": None, "substitutes": []} if isinstance(result, Exception) else result
+        for ingredient, result in zip(ingredients, results)
+    ]
+
+    if budget.partial:
+        return {"results": results, "partial": True}
+    return {"results": results}
 
 class TokenPayload(BaseModel):
     token: str
 
-@app.post("/api/auth/google")
-def google_login(payload: TokenPayload):
-    db = SessionLocal()
-    try:
-        # 1) 구글 토큰 검증
-        idinfo = id_token.verify_oauth2_token(
-            payload.token,
-            google_requests.Request(),
-            GOOGLE_CLIENT_ID
-        )
-        user_id = idinfo["sub"]
-        email   = idinfo.get("email")
-        name    = idinfo.get("name")
+# ✅ 구글 ID 토큰 로컬 검증기
+# 구글 서명 인증서를 Cache-Control max-age 동안 캐시해 두고 토큰 서명을 로컬에서 검증합니다.
+# (id_token.verify_oauth2_token은 호출마다 인증서를 다시 받아옵니다.)
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+GOOGLE_CERTS_DEFAULT_MAX_AGE = 60 * 60      # Cache-Control이 없을 때 캐시 시간 (초)
+GOOGLE_CERTS_MIN_REFRESH_INTERVAL = 60       # 모르는 kid로 인한 강제 갱신 최소 간격 (초)
+
+def parse_max_age(cache_control, default=GOOGLE_CERTS_DEFAULT_MAX_AGE):
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return int(match.group(1)) if match else default
 
+def token_key_id(token):
+    # 서명 검증 전 JWT 헤더에서 kid만 읽음
+    try:
+        header = token.split(".")[0]
+        return json.loads(base64.urlsafe_b64decode(header + "=" * (-len(header) % 4))).get("kid")
+    except Exception:
+        return None
+
+class GoogleTokenVerifier:
+    def __init__(self, certs_url=GOOGLE_CERTS_URL, client_id=None):
+        self.certs_url = certs_url
+        self.client_id = client_id
+        self._certs = None
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get_certs(self, force=False):
+        if not force and self._certs is not None and time.monotonic() < self._expires_at:
+            return self._certs
+        async with self._lock:
+            now = time.monotonic()
+            # 락을 기다리는 동안 다른 요청이 이미 갱신했으면 그대로 사용
+            if self._certs is not None and (
+                (not force and now < self._expires_at)
+                or (force and now - self._fetched_at < GOOGLE_CERTS_MIN_REFRESH_INTERVAL)
+            ):
+                return self._certs
+            async with track_upstream("google") as call:
+                response = await get_upstream_client("google").get(self.certs_url)
+                call["status"] = response.status_code
+            response.raise_for_status()
+            self._certs = response.json()
+            self._fetched_at = now
+            self._expires_at = now + parse_max_age(response.headers.get("Cache-Control"))
+            return self._certs
+
+    async def verify(self, token):
+        certs = await self.get_certs()
+        kid = token_key_id(token)
+        if kid is not None and kid not in certs:
+            certs = await self.get_certs(force=True)  # 구글 키 교체 직후
+        idinfo = google_jwt.decode(token, certs=certs, audience=self.client_id, clock_skew_in_seconds=10)
+        if idinfo.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"잘못된 토큰 발급자: {idinfo.get('iss')}")
+        return idinfo
+
+google_verifier = GoogleTokenVerifier(client_id=GOOGLE_CLIENT_ID)
+
+async def save_google_user(user_id, email, name):
+    # DB에 사용자가 없으면 저장하고 Supabase에도 upsert
+    async with resources.session() as db:
         # 2) DB에 사용자 존재 여부 확인
-        existing = db.query(User).filter(User.id == user_id).first()
+        existing = (await get_user_profile(db, user_id))["user"]
         if existing:
-            return {"message": "이미 등록된 사용자", "user": {
-                "id": existing.id,
-                "email": existing.email,
-                "name": existing.name
-            }}
+            return False, existing
 
         # 신규 사용자 저장
-        new_user = User(id=user_id, email=email, name=name)
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
-
-        # ▶ Supabase에도 upsert
-        supabase.table("users").upsert({
-            "id":    new_user.id,
-            "email": new_user.email,
-            "name":  new_user.name
-        }).execute()
+        db.add(User(id=user_id, email=email, name=name))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # 동시에 들어온 같은 사용자의 다른 로그인 요청이 먼저 저장한 경우
+            await db.rollback()
+            invalidate_user_profile(user_id)
+            return False, (await get_user_profile(db, user_id))["user"]
+        invalidate_user_profile(user_id)
+    user = {"id": user_id, "email": email, "name": name}
+
+    # ▶ Supabase에도 upsert (동기 클라이언트이므로 스레드풀에서 실행)
+    async with track_upstream("supabase") as call:
+        await asyncio.to_thread(lambda: resources.supabase.table("users").upsert(user).execute())
+        call["status"] = "ok"
+    return True, user
 
-        return {
-            "message": "회원가입 성공",
-            "user": {
-                "id":    new_user.id,
-                "email": new_user.email,
-                "name":  new_user.name
-            },
-            "result": "success"
-        }
+@app.post("/api/auth/google")
+async def google_login(payload: TokenPayload):
+    # 1) 구글 토큰 검증 (캐시된 인증서로 로컬 검증)
+    try:
+        idinfo = await google_verifier.verify(payload.token)
+    except (ValueError, google_exceptions.GoogleAuthError) as e:
+        raise HTTPException(status_code=401, detail=f"유효하지 않은 토큰: {e}")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=503, detail=f"구글 인증서를 가져오지 못했습니다: {e}")
 
+    try:
+        created, user = await save_google_user(idinfo["sub"], idinfo.get("email"), idinfo.get("name"))
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-    finally:
-        db.close()
+    if not created:
+        return {"message": "이미 등록된 사용자", "user": user}
+
+    return {
+        "message": "회원가입 성공",
+        "user": user,
+        "result": "success"
+    }
+
+# ✅ 실시간 사용자 이벤트 허브
+# 워커당 하나의 Supabase Realtime 구독을 모든 WebSocket 클라이언트에 전달합니다.
+# 클라이언트마다 크기 제한이 있는 버퍼를 두어 느린 클라이언트가 메모리를 계속 늘리지 못하게 합니다.
+WS_CLIENT_BUFFER_SIZE = int(os.getenv("WS_CLIENT_BUFFER_SIZE", "100"))
+
+class WebSocketClientBuffer:
+    # 같은 행에 대한 UPDATE는 최신 것 하나로 합치고, 가득 차면 가장 오래된 이벤트를 버립니다.
+    def __init__(self, maxsize=WS_CLIENT_BUFFER_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._event = asyncio.Event()
+        self._seq = 0
+        self.dropped = 0
+
+    def put(self, message):
+        row_id = (message.get("new") or {}).get("id")
+        if message["event"] == "UPDATE" and row_id is not None:
+            key = ("UPDATE", row_id)
+            self._items.pop(key, None)  # 아직 보내지 않은 이전 UPDATE는 대체
+        else:
+            self._seq += 1
+            key = self._seq
+        if len(self._items) >= self.maxsize:
+            self._items.popitem(last=False)
+            self.dropped += 1
+        self._items[key] = message
+        self._event.set()
+
+    async def get(self):
+        while not self._items:
+            self._event.clear()
+            await self._event.wait()
+        return self._items.popitem(last=False)[1]
+
+REALTIME_SUBSCRIBE_TIMEOUT = float(os.getenv("REALTIME_SUBSCRIBE_TIMEOUT", "10"))  # 구독 응답 대기 (초)
+REALTIME_RETRY_MAX_DELAY = float(os.getenv("REALTIME_RETRY_MAX_DELAY", "60"))      # 재구독 최대 대기 (초)
+REALTIME_CHECK_INTERVAL = 5  # 채널 상태 확인 주기 (초)
+
+class UsersRealtimeHub:
+    # 클라이언트가 있는 동안 구독 태스크가 채널을 유지하고,
+    # 구독이 실패하거나 채널이 끊기면 지수 백오프로 다시 구독합니다.
+    def __init__(self):
+        self._clients = set()
+        self._channel = None
+        self._task = None
+
+    def connect(self):
+        buffer = WebSocketClientBuffer()
+        self._clients.add(buffer)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())  # 첫 클라이언트가 접속할 때 구독 시작
+        return buffer
+
+    def disconnect(self, buffer):
+        self._clients.discard(buffer)
+        if not self._clients and self._task is not None:
+            self._task.cancel()  # 마지막 클라이언트가 나가면 구독 해제
+            self._task = None
+
+    async def _run(self):
+        delay = 1.0
+        channel = None
+        try:
+            while True:
+                try:
+                    channel = await self._subscribe()
+                    self._channel = channel
+                    delay = 1.0
+                    logger.info("✅ Realtime 구독 시작", extra={"fields": {"clients": len(self._clients)}})
+                    while channel.is_joined or channel.is_joining:
+                        await asyncio.sleep(REALTIME_CHECK_INTERVAL)
+                    logger.warning("❌ Realtime 채널 끊김", extra={"fields": {"state": str(channel.state)}})
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error("❌ Realtime 구독 실패", extra={"fields": {"error": str(e), "retry_in": delay}})
+                if self._channel is channel:
+                    self._channel = None
+                await self._unsubscribe(channel)
+                channel = None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, REALTIME_RETRY_MAX_DELAY)
+        finally:
+            if self._channel is channel:
+                self._channel = None
+            if channel is not None:
+                await asyncio.shield(self._unsubscribe(channel))
+
+    async def _subscribe(self):
+        client = await resources.supabase_async()
+        result = asyncio.get_running_loop().create_future()
+
+        def on_state(state, error):
+            if not result.done():
+                result.set_result((state, error))
+
+        # Supabase Realtime 채널 구독 (public.users 테이블 변경)
+        channel = (
+            client.channel("public:users")
+            .on_postgres_changes("INSERT", self._on_change, table="users", schema="public")
+            .on_postgres_changes("UPDATE", self._on_change, table="users", schema="public")
+            .on_postgres_changes("DELETE", self._on_change, table="users", schema="public")
+        )
+        try:
+            await channel.subscribe(on_state)
+            state, error = await asyncio.wait_for(result, REALTIME_SUBSCRIBE_TIMEOUT)
+            if getattr(state, "value", state) != "SUBSCRIBED":
+                raise RuntimeError(f"구독 상태 {getattr(state, 'value', state)}: {error}")
+        except BaseException:
+            await asyncio.shield(self._unsubscribe(channel))
+            raise
+        return channel
+
+    async def _unsubscribe(self, channel):
+        if channel is None:
+            return
+        try:
+            await (await resources.supabase_async()).remove_channel(channel)
+        except Exception as e:
+            logger.warning("❌ Realtime 구독 해제 실패", extra={"fields": {"error": str(e)}})
+
+    def _on_change(self, payload):
+        # 비동기 클라이언트는 이벤트 루프 안에서 콜백을 호출하므로 바로 전달
+        data = payload["data"]
+        if data["type"] == "DELETE":
+            self._broadcast({"event": "DELETE", "old": data.get("old_record")})
+        else:
+            self._broadcast({"event": data["type"], "new": data.get("record")})
+
+    def _broadcast(self, message):
+        for buffer in self._clients:
+            buffer.put(message)
+
+    def stats(self):
+        return {
+            "clients": len(self._clients),
+            "subscribed": self._channel is not None and self._channel.is_joined,
+            "dropped": sum(buffer.dropped for buffer in self._clients),
+        }
+
+users_hub = UsersRealtimeHub()
 
 @app.websocket("/ws/users")
 async def users_ws(websocket: WebSocket):
@@ -537,63 +2912,79 @@ async def users_ws(websocket: WebSocket):
     WebSocket으로 실시간 전송합니다.
     """
     await websocket.accept()
-    # Supabase Realtime 채널 구독
-    channel = (
-        supabase
-        .channel("public:users")
-        .on("INSERT",  lambda payload: asyncio.create_task(
-            websocket.send_json({"event": "INSERT", "new": payload["new"]})
-        ))
-        .on("UPDATE",  lambda payload: asyncio.create_task(
-            websocket.send_json({"event": "UPDATE", "new": payload["new"]})
-        ))
-        .on("DELETE",  lambda payload: asyncio.create_task(
-            websocket.send_json({"event": "DELETE", "old": payload["old"]})
-        ))
-        .subscribe()
-    )
+    buffer = users_hub.connect()
 
-    try:
-        # 클라이언트가 연결을 끊을 때까지 대기
+    async def send_events():
         while True:
-            await asyncio.sleep(1)
-    except WebSocketDisconnect:
-        # 클라이언트가 연결을 종료한 경우
-        pass
+            await websocket.send_json(await buffer.get())
+
+    async def wait_disconnect():
+        # 클라이언트가 연결을 끊을 때까지 대기 (폴링 없이 receive로 감지)
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    tasks = [asyncio.create_task(send_events()), asyncio.create_task(wait_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
     finally:
-        # 구독 해제
-        supabase.remove_channel(channel)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        users_hub.disconnect(buffer)
 
 @app.get("/api/user/{user_id}")
-def get_user_info(user_id: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+async def get_user_info(user_id: str, db: AsyncSession = Depends(get_db)):
+    user = (await get_user_profile(db, user_id))["user"]
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     # avatar는 예시로 기본 이미지 URL 사용, nickname은 name과 동일하게 반환
     return {
-        "id": user.id,
-        "email": user.email,
-        "name": user.name,
-        "nickname": user.name,
+        "id": user["id"],
+        "email": user["email"],
+        "name": user["name"],
+        "nickname": user["name"],
         "avatar": "https://randomuser.me/api/portraits/men/32.jpg"
     }
 @app.put("/api/preferences/{user_id}")
-def update_preferences(
+async def update_preferences(
     user_id: str,
     payload: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    pref = db.query(UserPreferences).filter_by(user_id=user_id).first()
-    if not pref:
+    # 요청에 포함된 필드만 한 번의 UPDATE로 변경
+    values = {field: payload[field] for field in ("diet", "allergies") if field in payload}
+    if values:
+        result = await db.execute(
+            update(UserPreferences).where(UserPreferences.user_id == user_id).values(**values)
+        )
+        await db.commit()
+        invalidate_user_profile(user_id)
+        found = result.rowcount > 0
+    else:
+        found = (await get_user_profile(db, user_id))["preferences"] is not None
+    if not found:
         raise HTTPException(status_code=404, detail="Preferences not found")
 
-    pref.diet = payload.get("diet", pref.diet)
-    pref.allergies = payload.get("allergies", pref.allergies)
-
-    db.commit()
-    db.refresh(pref)
     return {"message": "Preferences updated"}
 
+# 번역 캐시 적중률 확인용
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    return {
+        "translation": translation_cache.stats(),
+        "recipe_detail": recipe_detail_cache.stats(),
+        "recipe_query": recipe_query_cache.stats(),
+        "glossary": ingredient_glossary.stats(),
+        "substitutes": substitute_graph.stats(),
+        "upstreams": {
+            "spoonacular": spoonacular_scheduler.stats(),
+            "deepl": deepl_scheduler.stats(),
+        },
+        "admission": {path: admission.stats() for path, admission in admission_endpoints.items()},
+    }
+
 # Add a new endpoint to translate a list of ingredients
 @app.post("/translate_ingredients_list/")
 async def translate_ingredients_list(request: IngredientsRequest):
@@ -613,46 +3004,333 @@ class FavoriteRequest(BaseModel):
     recipe_title: str
     recipe_image: str
 
+# ✅ 즐겨찾기 서비스
+# 쓰기는 큐에 넣고 일정 개수/시간마다 Supabase에 한 번에 bulk insert 합니다. (write-behind)
+# 읽기는 사용자별 로컬 미러에서 처리하며, 아직 저장되지 않은 항목도 함께 보여줍니다.
+# 재시도까지 실패한 배치는 로컬 DB outbox(favorites_outbox)에 보관하고 FAVORITES_RETRY_DELAY마다 다시 보냅니다.
+# 미러는 워커별로 따로 있으므로 다른 워커에서 추가한 항목이 빨리 보이도록 TTL을 짧게 둡니다.
+FAVORITES_STORE = os.getenv("FAVORITES_STORE", "supabase")                     # supabase | memory
+FAVORITES_FLUSH_BATCH_SIZE = int(os.getenv("FAVORITES_FLUSH_BATCH_SIZE", "50"))
+FAVORITES_FLUSH_INTERVAL = float(os.getenv("FAVORITES_FLUSH_INTERVAL", "0.5"))  # 초
+FAVORITES_FLUSH_RETRIES = int(os.getenv("FAVORITES_FLUSH_RETRIES", "3"))
+FAVORITES_RETRY_DELAY = float(os.getenv("FAVORITES_RETRY_DELAY", "30"))       # 저장 실패한 배치를 다시 보낼 때까지 (초)
+FAVORITES_MIRROR_TTL = float(os.getenv("FAVORITES_MIRROR_TTL", "5"))
+FAVORITES_MIRROR_MAX_USERS = int(os.getenv("FAVORITES_MIRROR_MAX_USERS", "10000"))
+
+class SupabaseFavoritesStore:
+    # 비동기 Supabase 클라이언트 사용 (스레드풀을 거치지 않음)
+    async def insert_many(self, rows):
+        client = await resources.supabase_async()
+        async with track_upstream("supabase") as call:
+            result = await client.table("favorites").insert(rows).execute()
+            call["status"] = "ok"
+        return result.data
+
+    async def list_for_user(self, user_id):
+        client = await resources.supabase_async()
+        async with track_upstream("supabase") as call:
+            result = await client.table("favorites").select("*").eq("user_id", user_id).execute()
+            call["status"] = "ok"
+        return result.data
+
+class InMemoryFavoritesStore:
+    # 테스트/로컬 실행용 인프로세스 저장소
+    def __init__(self):
+        self.rows = []
+
+    async def insert_many(self, rows):
+        inserted = []
+        for row in rows:
+            stored = {"id": len(self.rows) + 1, **row, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+            self.rows.append(stored)
+            inserted.append(dict(stored))
+        return inserted
+
+    async def list_for_user(self, user_id):
+        return [dict(row) for row in self.rows if row["user_id"] == user_id]
+
+class FavoritesService:
+    def __init__(self, store, batch_size=FAVORITES_FLUSH_BATCH_SIZE, flush_interval=FAVORITES_FLUSH_INTERVAL):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue()
+        self._pending = {}  # user_id -> 아직 저장되지 않은 행 목록
+        self._mirror = TTLCache(FAVORITES_MIRROR_MAX_USERS, FAVORITES_MIRROR_TTL)  # user_id -> 저장된 행 목록
+        self._locks = weakref.WeakValueDictionary()  # user_id -> 미러 갱신용 락
+        self._outboxed = set()     # outbox에 보관 중인 (user_id, recipe_id)
+        self._retry_timers = set()
+        self._worker = None
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def _lock(self, user_id):
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[user_id] = lock
+        return lock
+
+    async def add(self, row):
+        self._pending.setdefault(row["user_id"], []).append(row)
+        self._queue.put_nowait(row)
+        self.start()
+
+    async def recover(self):
+        # 시작 시 이전 프로세스가 저장하지 못하고 outbox에 남긴 항목을 다시 큐에 넣음
+        try:
+            async with resources.session() as db:
+                entries = (await db.execute(select(FavoriteOutboxEntry))).scalars().all()
+        except Exception as e:
+            logger.warning("❌ 즐겨찾기 outbox 조회 실패", extra={"fields": {"error": str(e)}})
+            return
+        for entry in entries:
+            self._outboxed.add((entry.user_id, entry.recipe_id))
+            await self.add({
+                "user_id": entry.user_id,
+                "recipe_id": entry.recipe_id,
+                "recipe_title": entry.recipe_title,
+                "recipe_image": entry.recipe_image,
+            })
+        if entries:
+            logger.info("📤 즐겨찾기 outbox 재전송", extra={"fields": {"rows": len(entries)}})
+
+    async def list(self, user_id):
+        async with self._lock(user_id):
+            rows = self._mirror.get(user_id)
+            if rows is None:
+                rows = await self.store.list_for_user(user_id)
+                self._mirror.set(user_id, rows)
+            pending = list(self._pending.get(user_id, []))
+        # 저장 직후 미러에 이미 반영된 항목은 중복으로 보여주지 않음
+        stored_ids = {row["recipe_id"] for row in rows}
+        return rows + [row for row in pending if row["recipe_id"] not in stored_ids]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            row = await self._queue.get()
+            if row is None:  # 종료 신호
+                return
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    closing = True
+                    break
+                batch.append(row)
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        stored = None
+        for attempt in range(FAVORITES_FLUSH_RETRIES):
+            try:
+                stored = await self.store.insert_many(batch)
+                break
+            except Exception as e:
+                logger.warning("❌ 즐겨찾기 저장 실패", extra={"fields": {
+                    "attempt": attempt + 1, "retries": FAVORITES_FLUSH_RETRIES, "rows": len(batch), "error": str(e)
+                }})
+                if attempt + 1 < FAVORITES_FLUSH_RETRIES:
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+
+        if stored is None:
+            # 저장될 때까지 _pending에 남겨 목록에 계속 보여주고, outbox에 보관한 뒤 나중에 다시 보냄
+            await self._save_outbox(batch)
+            self._schedule_retry(batch)
+            return
+        await self._clear_outbox(batch)
+
+        for user_id in {row["user_id"] for row in batch}:
+            async with self._lock(user_id):
+                pending = self._pending.get(user_id, [])
+                self._pending[user_id] = [row for row in pending if not any(row is sent for sent in batch)]
+                if not self._pending[user_id]:
+                    del self._pending[user_id]
+
+                rows = self._mirror.get(user_id)
+                user_rows = [row for row in stored or [] if row.get("user_id") == user_id]
+                if rows is None:
+                    continue
+                if user_rows and all(row.get("id") is not None for row in user_rows):
+                    known = {row.get("id") for row in rows}
+                    rows.extend(row for row in user_rows if row["id"] not in known)
+                else:
+                    self._mirror.pop(user_id)  # 저장 결과를 알 수 없으면 다음 읽기 때 다시 조회
+
+    async def _save_outbox(self, batch):
+        try:
+            async with resources.session() as db:
+                for row in batch:
+                    await db.merge(FavoriteOutboxEntry(
+                        user_id=row["user_id"],
+                        recipe_id=row["recipe_id"],
+                        recipe_title=row.get("recipe_title"),
+                        recipe_image=row.get("recipe_image"),
+                        created_at=time.time()
+                    ))
+                await db.commit()
+            self._outboxed.update((row["user_id"], row["recipe_id"]) for row in batch)
+        except Exception as e:
+            # outbox에도 못 남기면 이 프로세스가 살아 있는 동안의 재시도에만 의존
+            logger.error("❌ 즐겨찾기 outbox 저장 실패", extra={"fields": {"rows": len(batch), "error": str(e)}})
+
+    async def _clear_outbox(self, batch):
+        keys = [(row["user_id"], row["recipe_id"]) for row in batch if (row["user_id"], row["recipe_id"]) in self._outboxed]
+        if not keys:
+            return
+        try:
+            async with resources.session() as db:
+                for user_id, recipe_id in keys:
+                    entry = await db.get(FavoriteOutboxEntry, (user_id, recipe_id))
+                    if entry is not None:
+                        await db.delete(entry)
+                await db.commit()
+            self._outboxed.difference_update(keys)
+        except Exception as e:
+            logger.warning("❌ 즐겨찾기 outbox 정리 실패", extra={"fields": {"rows": len(keys), "error": str(e)}})
+
+    def _schedule_retry(self, batch):
+        def requeue():
+            self._retry_timers.discard(timer)
+            for row in batch:
+                self._queue.put_nowait(row)
+            self.start()
+
+        timer = asyncio.get_running_loop().call_later(FAVORITES_RETRY_DELAY, requeue)
+        self._retry_timers.add(timer)
+
+    async def aclose(self):
+        # 종료 전에 큐에 남은 쓰기를 모두 저장 (종료 신호 앞의 항목까지 처리 후 워커 종료)
+        # 재시도를 기다리던 배치는 outbox에 남아 있으므로 다음 시작 때 다시 보냄
+        if self._worker is not None and not self._worker.done():
+            self._queue.put_nowait(None)
+            await self._worker
+        for timer in self._retry_timers:
+            timer.cancel()
+        self._retry_timers.clear()
+        # 저장하지 못한 항목은 outbox에 있으므로 다음 시작 때 recover()로 다시 보냄
+        self._queue = asyncio.Queue()
+        self._pending.clear()
+        self._outboxed.clear()
+
+favorites_service = FavoritesService(InMemoryFavoritesStore() if FAVORITES_STORE == "memory" else SupabaseFavoritesStore())
+
 @app.post("/api/favorites")
-def add_favorite(req: FavoriteRequest):
-    supabase.table("favorites").insert({
+async def add_favorite(req: FavoriteRequest):
+    await favorites_service.add({
         "user_id": req.user_id,
         "recipe_id": req.recipe_id,
         "recipe_title": req.recipe_title,
         "recipe_image": req.recipe_image
-    }).execute()
+    })
     return {"message": "즐겨찾기 추가 완료"}
 
 @app.get("/api/favorites/{user_id}")
-def get_favorites(user_id: str):
-    result = supabase.table("favorites").select("*").eq("user_id", user_id).execute()
-    return result.data
-
-from fastapi.responses import JSONResponse
+async def get_favorites(user_id: str):
+    return await favorites_service.list(user_id)
+
+# 다중 레시피 상세 조회 시 동시에 진행할 최대 조회 수
+MULTI_DETAIL_CONCURRENCY = int(os.getenv("MULTI_DETAIL_CONCURRENCY", "8"))
+MULTI_DETAIL_MAX_IDS = int(os.getenv("MULTI_DETAIL_MAX_IDS", "50"))  # 요청당 최대 레시피 수
+
+def build_multiple_recipe_item(rid, recipe):
+    recipe_data = {
+        "id": rid,
+        "title": recipe.get("title"),
+        "title_kr": recipe.get("title_kr"),
+        "summary": recipe.get("summary"),
+        "instructions": recipe.get("instructions", ""),
+        "ingredients": recipe.get("ingredients", []),
+        "image": recipe.get("image"),
+        "readyInMinutes": recipe.get("readyInMinutes"),
+        "servings": recipe.get("servings"),
+    }
+    if "error" in recipe:
+        recipe_data["error"] = recipe["error"]
+    if recipe.get("partial"):
+        recipe_data["partial"] = True
+    return recipe_data
 
 @app.post("/get_multiple_recipe_details/")
-async def get_multiple_recipe_details(recipe_ids: List[int]):
-    results = []
-
-    for rid in recipe_ids:
-        recipe = await get_recipe_detail_async(rid)  # ✅ 비동기 함수 호출
-
-        if not isinstance(recipe, dict):
-            continue  # 오류 응답은 건너뛰기
-
-        recipe_data = {
-            "id": rid,
-            "title": recipe.get("title"),
-            "title_kr": recipe.get("title_kr"),
-            "summary": recipe.get("summary"),
-            "instructions": recipe.get("instructions", ""),
-            "ingredients": recipe.get("ingredients", []),
-            "image": recipe.get("image"),
-            "readyInMinutes": recipe.get("readyInMinutes"),
-            "servings": recipe.get("servings"),
-        }
-        results.append(recipe_data)
+async def get_multiple_recipe_details(
+    recipe_ids: List[int],
+    stream: bool = Query(False),                    # true면 준비되는 순서대로 NDJSON 한 줄씩 전송
+    translate: Optional[str] = Query(None),         # 번역할 필드 (title,summary,instructions,ingredients / none)
+    lang: str = Query("KO", pattern=LANG_PATTERN)   # 번역 대상 언어
+):
+    if len(recipe_ids) > MULTI_DETAIL_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"❌ 레시피는 최대 {MULTI_DETAIL_MAX_IDS}개까지 요청할 수 있습니다.")
+    fields = parse_translate_fields(translate, DETAIL_TRANSLATABLE_FIELDS)
+    semaphore = asyncio.Semaphore(MULTI_DETAIL_CONCURRENCY)
+
+    async def load(index, rid):
+        async with semaphore:
+            try:
+                with request_priority(PRIORITY_BATCH):  # 일괄 조회는 사용자 단건 요청보다 뒤로
+                    recipe = await get_recipe_detail_async(rid, fields, lang)  # ✅ 비동기 함수 호출
+            except Exception as e:
+                # 한 레시피의 실패가 전체 응답을 막지 않도록 항목 단위로 처리
+                logger.exception("❌ 레시피 상세 정보 조회 중 오류 발생", extra={"fields": {"recipe_id": rid}})
+                recipe = {"error": "Failed to fetch recipe info"}
+        return index, build_multiple_recipe_item(rid, recipe)
+
+    if stream:
+        async def frames():
+            tasks = [asyncio.create_task(load(i, rid)) for i, rid in enumerate(recipe_ids)]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    index, recipe_data = await next_done
+                    # 완료 순서대로 전송하므로 요청 순서를 index로 함께 알려줌
+                    yield {"index": index, **recipe_data}
+            finally:
+                for task in tasks:
+                    task.cancel()  # 클라이언트가 연결을 끊으면 남은 조회 중단
+
+        return streaming_frames_response(frames())
+
+    with request_budget(BATCH_REQUEST_BUDGET_SECONDS):
+        results = await asyncio.gather(*(load(i, rid) for i, rid in enumerate(recipe_ids)))
+    return JSONResponse(content=[recipe_data for _, recipe_data in results])
+
+# ✅ 헬스 체크
+# /health: 프로세스가 살아 있는지 (외부 의존성 확인 없음)
+# /ready: 시작이 끝나고 캐시 예열이 완료되었으며 DB에 연결되는지
+@app.get("/health", include_in_schema=False)
+def health():
+    return {"status": "ok"}
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    checks = {
+        "started": app_state.started,
+        "prewarm": (
+            "pending" if app_state.prewarm_task is None or not app_state.prewarm_task.done()
+            else "failed" if app_state.prewarm_error else "done"
+        ),
+    }
+    try:
+        async with resources.engine.connect() as conn:
+            await conn.execute(select(literal(1)))
+        checks["database"] = "ok"
+    except Exception as e:
+        checks["database"] = f"error: {e}"
 
-    return JSONResponse(content=results)
+    # 예열 실패는 캐시가 비어 있을 뿐이므로 준비 완료로 간주
+    is_ready = checks["started"] and checks["prewarm"] != "pending" and checks["database"] == "ok"
+    return JSONResponse({"ready": is_ready, "checks": checks}, status_code=200 if is_ready else 503)
 
-print("SPOONACULAR_API_KEY:", os.getenv("SPOONACULAR_API_KEY"))
+# ✅ Prometheus 메트릭 엔드포인트
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
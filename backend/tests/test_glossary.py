@@ -0,0 +1,41 @@
+"""IngredientGlossary.lookup 테스트 (data/ingredient_glossary.json 기준)."""
+import pytest
+
+import main
+
+
+@pytest.fixture
+def glossary():
+    glossary = main.IngredientGlossary()
+    glossary.load()
+    return glossary
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("eggs", "계란"),                # 용어집에 적힌 복수형 별칭
+    ("Cherry  Tomatoes", "방울토마토"),  # 대소문자·공백 정규화
+    ("eggplants", "가지"),             # 적혀 있지 않은 복수형은 단수형 항목으로
+    ("hot peppers", "고추"),
+])
+def test_lookup_plural(glossary, text, expected):
+    assert glossary.lookup(text, "KO") == expected
+
+
+def test_plural_with_different_meaning_uses_its_own_entry(glossary):
+    assert glossary.lookup("pepper", "KO") == "후추"
+    assert glossary.lookup("peppers", "KO") == "피망"
+
+
+@pytest.mark.parametrize("text", ["greens", "dates", "capers"])
+def test_plural_without_glossary_singular_misses(glossary, text):
+    assert glossary.lookup(text, "KO") is None
+
+
+def test_learned_terms_are_not_singularized(glossary):
+    glossary.learn("green", "초록색", "KO")
+    assert glossary.lookup("green", "KO") == "초록색"
+    assert glossary.lookup("greens", "KO") is None
+
+
+def test_lookup_korean_ignores_spaces(glossary):
+    assert glossary.lookup("참 기름", "EN-US") == "sesame oil"
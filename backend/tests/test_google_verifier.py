@@ -0,0 +1,154 @@
+"""GoogleTokenVerifier.verify 테스트.
+
+자체 서명 인증서를 구글 인증서 엔드포인트 형식({kid: PEM})으로 내려주는 로컬 서버를 띄우고,
+그 주소를 GOOGLE_CERTS_URL 대신 사용합니다.
+"""
+import asyncio
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt
+from google.auth import jwt as google_jwt
+
+import main
+
+CLIENT_ID = "test-client.apps.googleusercontent.com"
+
+
+def make_key_pair():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test-google-certs")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    cert_pem = cert.public_bytes(serialization.Encoding.PEM).decode()
+    return private_pem, cert_pem
+
+
+class CertServer:
+    def __init__(self):
+        self.certs = {}
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                body = json.dumps(server.certs).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", "public, max-age=3600")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/oauth2/v1/certs"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {"kid-1": make_key_pair(), "kid-2": make_key_pair()}
+
+
+@pytest.fixture
+def cert_server(keys):
+    server = CertServer()
+    server.certs = {"kid-1": keys["kid-1"][1]}
+    yield server
+    server.close()
+
+
+def make_token(keys, kid="kid-1", audience=CLIENT_ID, issued_at=None, lifetime=3600):
+    issued_at = int(time.time()) if issued_at is None else issued_at
+    signer = crypt.RSASigner.from_string(keys[kid][0], key_id=kid)
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": audience,
+        "sub": "1234567890",
+        "email": "user@example.com",
+        "iat": issued_at,
+        "exp": issued_at + lifetime,
+    }
+    return google_jwt.encode(signer, payload).decode()
+
+
+def verify(verifier, token):
+    async def run():
+        try:
+            return await verifier.verify(token)
+        finally:
+            await main.resources.aclose()  # 테스트마다 이벤트 루프가 다르므로 HTTP 클라이언트를 닫음
+
+    return asyncio.run(run())
+
+
+def test_valid_token(keys, cert_server):
+    verifier = main.GoogleTokenVerifier(certs_url=cert_server.url, client_id=CLIENT_ID)
+    idinfo = verify(verifier, make_token(keys))
+    assert idinfo["sub"] == "1234567890"
+    assert idinfo["email"] == "user@example.com"
+    assert cert_server.requests == 1
+
+
+def test_expired_token(keys, cert_server):
+    verifier = main.GoogleTokenVerifier(certs_url=cert_server.url, client_id=CLIENT_ID)
+    token = make_token(keys, issued_at=int(time.time()) - 7200, lifetime=3600)
+    with pytest.raises(ValueError):
+        verify(verifier, token)
+
+
+def test_wrong_audience(keys, cert_server):
+    verifier = main.GoogleTokenVerifier(certs_url=cert_server.url, client_id=CLIENT_ID)
+    with pytest.raises(ValueError):
+        verify(verifier, make_token(keys, audience="someone-else.apps.googleusercontent.com"))
+
+
+def test_unknown_kid_refreshes_certs(keys, cert_server, monkeypatch):
+    monkeypatch.setattr(main, "GOOGLE_CERTS_MIN_REFRESH_INTERVAL", 0)
+    verifier = main.GoogleTokenVerifier(certs_url=cert_server.url, client_id=CLIENT_ID)
+    verify(verifier, make_token(keys, kid="kid-1"))
+
+    # 구글이 키를 교체: 캐시된 인증서에는 없는 kid로 서명된 토큰
+    cert_server.certs = {"kid-2": keys["kid-2"][1]}
+    idinfo = verify(verifier, make_token(keys, kid="kid-2"))
+    assert idinfo["sub"] == "1234567890"
+    assert cert_server.requests == 2
+
+
+def test_unknown_kid_not_refreshed_within_min_interval(keys, cert_server):
+    verifier = main.GoogleTokenVerifier(certs_url=cert_server.url, client_id=CLIENT_ID)
+    verify(verifier, make_token(keys, kid="kid-1"))
+
+    # 방금 받아 온 인증서는 모르는 kid가 와도 다시 받지 않음 (임의의 kid로 갱신을 유발하는 요청 방지)
+    with pytest.raises(ValueError):
+        verify(verifier, make_token(keys, kid="kid-2"))
+    assert cert_server.requests == 1
@@ -65,7 +65,7 @@ export default function FavoritesScreen() {
 
           const detailRes = await fetch(`${BACKEND_URL}/get_multiple_recipe_details/`, {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: { 'Content-Type': 'application/json', 'X-User-Id': String(userId).trim() },
             body: JSON.stringify(recipeIds),
           });
 
@@ -18,6 +18,7 @@ import AsyncStorage from '@react-native-async-storage/async-storage';
 import { Ionicons } from '@expo/vector-icons';
 import BottomTabBar from '../../components/BottomTabBar';
 import { useRecipeFilter } from '../../context/RecipeFilterContext';
+import { useAuth } from '../../context/AuthContext';
 import { Recipe, DietaryOption } from '../../types';
 
 const { width } = Dimensions.get('window');
@@ -36,6 +37,7 @@ export default function FunctionScreen() {
     matchRecipes, 
     setMatchRecipes 
   } = useRecipeFilter();
+  const { userId } = useAuth();
 
   const [dietary, setDietary] = useState<DietaryOption[]>([]);
   const [allergies, setAllergies] = useState<string>('');
@@ -215,6 +217,8 @@ export default function FunctionScreen() {
         headers: {
           'Content-Type': 'application/json',
           Accept: 'application/json',
+          // 서버가 사용자별로 동시 요청 수를 나눠 제한 (없으면 IP 기준)
+          ...(userId ? { 'X-User-Id': String(userId).trim() } : {}),
         },
         body: JSON.stringify(requestBody),
       });
@@ -260,6 +264,8 @@ export default function FunctionScreen() {
         headers: {
           'Content-Type': 'application/json',
           Accept: 'application/json',
+          // 서버가 사용자별로 동시 요청 수를 나눠 제한 (없으면 IP 기준)
+          ...(userId ? { 'X-User-Id': String(userId).trim() } : {}),
         },
         body: JSON.stringify(requestBody),
       });